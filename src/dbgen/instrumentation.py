@@ -0,0 +1,222 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Phases:
+    """
+    Times the phases of a build and reports each of them to a listener as
+    structured events. Phases can be nested, ie the insert of every chunk
+    inside of the load phase.
+
+    The listener is called with one dictionary per event,
+
+    - {'event': 'start', 'phase': ..., 'path': [...], 'time': ..., 'pid': ...}
+      when a phase starts, along with any details of the phase such as the
+      table or the part.
+    - {'event': 'end', ..., 'seconds': ...} when it ends, along with 'rows'
+      and 'bytes' where they are known and 'peak_memory', the peak of the
+      memory traced by tracemalloc during the phase in bytes, if tracemalloc
+      is tracing.
+    - {'event': 'progress', 'phase': ..., 'part': ..., 'parts': ...} when
+      the build moves on to part of parts of a phase, ie the windows of
+      ohlcv.
+    - {'event': 'finish', 'timings': ...} once the build is done.
+
+    path is the list of the names of the phase and of the phases it is
+    nested in, ie ['ohlcv', 'insert'].
+
+    Parameters
+    --------------------------------------------------
+    listener : callable, Default None
+        Called with every event. If None, the phases are only timed.
+
+    path : list, Default []
+        The path of the phase that these phases are nested in. This is used
+        by worker processes, whose events are passed on by the main process.
+
+    Attributes
+    --------------------------------------------------
+    timings : dict
+        The total seconds spent in each of the outermost phases.
+
+    Example Usage
+    --------------------------------------------------
+    phases = Phases(print)
+
+    with phases.phase('load') as counts:
+        with phases.phase('insert', table='mailing') as counts:
+            counts['rows'] = load(conn, table, columns)
+
+    phases.finish()
+    """
+
+    def __init__(self, listener=None, path=[]):
+        self.listener = listener
+        self.path = list(path)
+        self.timings = {}
+
+        # the names and the running peak memory of the open phases
+        self._names = []
+        self._peaks = []
+
+    @contextmanager
+    def phase(self, name, **details):
+        """
+        Times the phase. The block can add the 'rows' and 'bytes' of the
+        phase to the yielded dictionary.
+        """
+        path = self.path + self._names + [name]
+        self.emit({'event': 'start', 'phase': name, 'path': path, **details})
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            self._update_peaks()
+        self._names.append(name)
+        self._peaks.append(0)
+
+        counts = {}
+        tic = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            seconds = time.perf_counter() - tic
+            self._names.pop()
+            peak = self._peaks.pop()
+            if len(path) == 1:
+                self.timings[name] = self.timings.get(name, 0) + seconds
+
+            event = {
+                'event': 'end',
+                'phase': name,
+                'path': path,
+                **details,
+                'seconds': seconds,
+                **counts
+            }
+            if tracing:
+                event['peak_memory'] = max(peak, self._update_peaks())
+            self.emit(event)
+
+    def iterate(self, name, iterable, **details):
+        """
+        Yields the items of iterable and times each step of it as a phase,
+        ie the wait for the next window of prices.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name, **details):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def emit(self, event):
+        if self.listener is not None:
+            self.listener({'time': time.time(), 'pid': os.getpid(), **event})
+
+    def finish(self):
+        self.emit({'event': 'finish', 'timings': self.timings})
+
+    def _update_peaks(self):
+        """
+        Folds the traced peak since the last update into the peaks of the
+        open phases and starts a new peak.
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        self._peaks = [max(p, peak) for p in self._peaks]
+        tracemalloc.reset_peak()
+        return peak
+
+
+class TimingReport:
+    """
+    A listener for the create functions that collects the events of the
+    build and sums them up per phase. Unless memory is False, it starts
+    tracemalloc so that the peak memory of each phase is known, and stops it
+    again when the build is done. Tracing the memory slows the build down.
+
+    Parameters
+    --------------------------------------------------
+    path : str, Default None
+        If given, the report is written to this json file when the build is
+        done.
+
+    memory : boolean, Default True
+        Trace the peak memory of each phase with tracemalloc.
+
+    Methods
+    --------------------------------------------------
+    report
+        Returns the report as a dictionary.
+
+    write
+        Writes the report to a json file.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+    from dbgen.parents_and_children import create
+
+    report = TimingReport('timings.json')
+    create(db.create_engine("..."), no_parents=10 ** 6, listener=report)
+
+    report.report()['phases']['load/insert']
+    >>> {'calls': 3, 'seconds': 41.2, 'rows': 4200000, 'peak_memory': ...}
+    """
+
+    def __init__(self, path=None, memory=True):
+        self.path = path
+        self.events = []
+        self._tracing = memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    def __call__(self, event):
+        self.events.append(event)
+        if event['event'] == 'finish':
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+            if self.path is not None:
+                self.write(self.path)
+
+    def report(self):
+        """
+        Returns
+        --------------------------------------------------
+        dict
+            'timings' are the seconds of the outermost phases that the create
+            function returns and 'phases' has the number of calls, the total
+            seconds, rows and bytes and the largest peak memory of every
+            phase by its path, ie 'ohlcv/insert'.
+        """
+        phases = {}
+        timings = {}
+        for event in self.events:
+            if event['event'] == 'finish':
+                timings = event['timings']
+            if event['event'] != 'end':
+                continue
+
+            summary = phases.setdefault(
+                '/'.join(event['path']), {'calls': 0, 'seconds': 0.0}
+            )
+            summary['calls'] += 1
+            summary['seconds'] += event['seconds']
+            for key in ['rows', 'bytes']:
+                if key in event:
+                    summary[key] = summary.get(key, 0) + int(event[key])
+            if 'peak_memory' in event:
+                summary['peak_memory'] = max(
+                    summary.get('peak_memory', 0), event['peak_memory']
+                )
+
+        return {'timings': timings, 'phases': phases}
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
@@ -5,13 +5,22 @@ from importlib import resources
 from types import NoneType
 import sqlalchemy as db
 from sqlalchemy.orm import declarative_base as Base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils import create_database, database_exists, drop_database
 import numpy as np
 import datetime as dt
-import yfinance as yf
 import pandas as pd
-from ._utils import convert_sql_to_string, transaction_chain
+from ..instrumentation import Phases
+from ..loaders import check_upsert, load, upsert
+from ..sinks import DatabaseSink
+from ..utils import create_constraints, create_indexes, create_tables
+from ._utils import (
+    CachedPriceSource,
+    YahooPriceSource,
+    convert_sql_to_string,
+    download_windows,
+    nan_gaps,
+    portfolio_replay,
+    transaction_chains
+)
 
 
 class InvestorReutrns:
@@ -110,6 +119,14 @@ class InvestorReutrns:
         make_nans: int = 20,
         max_nans_in_a_row: int = 5,
         drop_db_if_exists: bool = True,
+        price_source=None,
+        prefetch: int = 2,
+        build_portfolio: bool = False,
+        cache_dir: str | NoneType = None,
+        offline: bool = False,
+        defer_indexes: bool = False,
+        sink=None,
+        listener=None,
     ):
         """
         This function will initialize the database, create the tables and then
@@ -165,209 +182,550 @@ class InvestorReutrns:
         drop_db_if_exists : boolean, Default True
             Will drop the database and recreate it if already exists.
 
+        price_source : price source, Default YahooPriceSource()
+            Where the stock prices come from. Any object with a 
+            fetch(tickers, start, end, interval) method that returns a frame
+            in the format of yfinance.download can be used, ie 
+            FramePriceSource to build the database offline from a fixture or
+            SyntheticPriceSource to build it from made up prices without the
+            history limits of yahoo.
+
+        prefetch : int, Default 2
+            The number of time windows that are fetched from the price source
+            in a thread pool while the current window is transformed and
+            written. This bounds the number of windows held in memory.
+
+        build_portfolio : boolean, Default False
+            If true, the trigger is not created. The transactions are bulk
+            loaded and the portfolio table is then computed from them in a
+            single set-based pass that gives the same rows as the trigger.
+            This is much faster for large loads and also works on servers
+            other than MySQL, such as sqlite and PostgreSQL.
+
+        cache_dir : str, Default None
+            If given, the prices are cached on disk in this directory with
+            CachedPriceSource and only the prices that are not in the cache
+            yet are fetched from the price source.
+
+        offline : boolean, Default False
+            Only use the prices in cache_dir and raise a FileNotFoundError as
+            soon as some of them are missing, without fetching anything.
+
+        defer_indexes : boolean, Default False
+            If true, the tables are created without their secondary indexes,
+            ie ohlcv(ticker, datetime), and the indexes are built in one pass
+            after all of the rows are loaded. On servers other than SQLite,
+            ie MySQL and PostgreSQL, the primary keys and check constraints
+            of ohlcv and transaction_history are left out as well and are
+            added with ALTER TABLE once the rows are loaded, and so are the
+            ones of portfolio unless the trigger needs its primary key.
+            SQLite can not alter them, so there they are created with the
+            tables.
+
+        sink : dbgen.sinks.CsvSink or dbgen.sinks.ParquetSink, Default None
+            If given, no database is used at all. The tables are written to
+            files by the sink instead, with one part of ohlcv per time window
+            and a single part of transaction_history and portfolio. There is
+            no trigger, so the portfolio is built as with build_portfolio.
+
+        listener : callable, Default None
+            Called with a dictionary for the start and end of every phase of
+            the build, ie the schema, the trigger, and the download,
+            transform, insert and commit of each window, with their rows,
+            bytes and peak memory, and with the progress of the windows,
+            see dbgen.instrumentation.Phases. Nothing is printed.
+            dbgen.instrumentation.TimingReport collects them into a json
+            report.
+
         returns:
             The function will create a database with name specified in the 
             engine which is inputed by the user. It will populate the database
             with three tabled named "ohlcv", "transaction_history", and 
             "portfolio"."transaction_history" will be linked to "portfolio" 
             through a trigger and all transactions will update the portfolio
-            automatically.
+            automatically. The time in seconds spent in each phase of the
+            build is returned as a dictionary.
         """
-        
-        if drop_db_if_exists:
-            if database_exists(self.engine.url):
-                drop_database(self.engine.url) 
-
-        if not database_exists(self.engine.url):
-            create_database(self.engine.url) 
-
-        self.base.metadata.create_all(bind=self.engine)
-        
-        if with_trigger:
-            if trigger_path is None:
-                with resources.open_text(
-                    'dbgen.investor_returns._sql', 'trigger.sql'
-                ) as file:
-                    sql_content = file.read()
-        
-                with self.engine.connect() as conn:
-                    conn.execute(db.text(sql_content))
-            else:
-                with self.engine.connect() as conn:
-                    conn.execute(
-                        db.text(
-                            convert_sql_to_string(trigger_path)
-                        )
+
+        price_source = _price_source(price_source, cache_dir, offline)
+        if offline:
+            price_source.check(tickers, start, end, time_step)
+
+        phases = Phases(listener)
+
+        database = sink is None
+        if not database:
+            build_portfolio = True
+
+        # the tables that are loaded without their primary key and checks.
+        # The trigger updates the portfolio by its primary key
+        heaps = []
+        if database and defer_indexes:
+            heaps = ['ohlcv', 'transaction_history']
+            if not (with_trigger and not build_portfolio):
+                heaps.append('portfolio')
+
+        # the trans_id is given explicitly when there is no database to
+        # assign it, or the database is SQLite, which can not autoincrement
+        # a column of a composite primary key
+        trans_id = self.TransactionHistory.__table__.c.trans_id
+        if not database or self.engine.dialect.name == 'sqlite':
+            trans_id.autoincrement = False
+
+        with phases.phase('create_tables'):
+            if database:
+                # sqlalchemy_utils is slow to import and only needed with a
+                # database
+                from sqlalchemy_utils import (
+                    create_database, database_exists, drop_database
+                )
+
+                sink = DatabaseSink(self.engine)
+
+                with phases.phase('schema'):
+                    if drop_db_if_exists:
+                        if database_exists(self.engine.url):
+                            drop_database(self.engine.url)
+
+                    if not database_exists(self.engine.url):
+                        create_database(self.engine.url)
+
+                    heaps = create_tables(
+                        self.engine,
+                        self.base.metadata,
+                        indexes=not defer_indexes,
+                        heaps=heaps
                     )
-                    conn.commit()
-        
-        # batch the time for yfinance stock scraping
-        elapsed_time = (end - start).total_seconds()
+
+            if with_trigger and not build_portfolio:
+                with phases.phase('trigger'):
+                    if trigger_path is None:
+                        with resources.open_text(
+                            'dbgen.investor_returns._sql', 'trigger.sql'
+                        ) as file:
+                            sql_content = file.read()
+
+                        with self.engine.connect() as conn:
+                            conn.execute(db.text(sql_content))
+                    else:
+                        with self.engine.connect() as conn:
+                            conn.execute(
+                                db.text(
+                                    convert_sql_to_string(trigger_path)
+                                )
+                            )
+                            conn.commit()
+
+        # batch the time for yfinance stock scraping. The next windows are
+        # fetched in a thread pool while the current one is written, so the
+        # download phase is the time spent waiting for the next window.
         batch_time = 60 * 60 * 24 * 5
-        
-        batch_no = 0
-        while batch_no * batch_time < elapsed_time:
-            batch_no += 1
-            print(
-                f'batch {batch_no} / {elapsed_time // batch_time + 1}'
-            )
-            df = yf.download(
-                tickers=tickers,
-                start=start + dt.timedelta(seconds = batch_time * (batch_no - 1)),
-                end=min(
-                    start + dt.timedelta(seconds = batch_time * batch_no), 
-                    end
-                ),
-                interval=time_step,
-                prepost=True
-            )
 
-            if len(tickers) == 1:
-                col = pd.MultiIndex.from_product([df.columns.values, tickers])
-                df = df.set_axis(col, axis=1)
-
-            # remove the GMT time part that yfinaces gives
-            df.index = df.index.to_series().apply(
-                lambda x: str(x)[: -6]
-            ).reset_index(drop=True)
-            
-            # rename the multicolumn
-            df.columns.names = ['ohlcv', 'ticker']
-
-            for ticker in tickers:
-
-                query = f"ticker == '{ticker}' "
-                query += "and ohlcv in ['Open', 'High', 'Low', 'Close', 'Volume']"
-                sub_df = df.T.query(
-                    query
-                ).T.reset_index()
-                
-                for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                    sub_df[col] = sub_df[col].astype(float).interpolate()
-                
-                sub_df['timestamp'] = [
-                    dt.datetime.strptime(
-                        npdt, '%Y-%m-%d %H:%M:%S'
-                    ).timestamp() for npdt in sub_df['Datetime'].values
+        with phases.phase('ohlcv'):
+            open_prices, ohlcv_parts = [], []
+            for batch_no, no_batches, df in phases.iterate(
+                'download',
+                download_windows(
+                    price_source,
+                    tickers,
+                    start,
+                    end,
+                    time_step,
+                    batch_time,
+                    prefetch=prefetch
+                )
+            ):
+                phases.emit({
+                    'event': 'progress',
+                    'phase': 'ohlcv',
+                    'part': batch_no,
+                    'parts': no_batches
+                })
+
+                with phases.phase('transform', part=batch_no) as counts:
+                    sub_df = _long_ohlcv(df, tickers)
+                    no_rows = len(sub_df['datetime']) // len(tickers)
+                    wall = sub_df['datetime'][:no_rows]
+                    counts['rows'] = len(sub_df['datetime'])
+
+                # push to the sql server in one write. The datetimes go as
+                # datetimes rather than strings, so every dialect stores them
+                # in its own datetime format
+                sink.write({self.OHLCV.__table__: sub_df}, batch_no, phases)
+                ohlcv_parts.append(batch_no)
+
+                open_prices.append(pd.DataFrame(
+                    sub_df['open'].reshape((len(tickers), no_rows)).T,
+                    index=wall,
+                    columns=tickers
+                ))
+
+        with phases.phase('transactions'):
+            with phases.phase('generate') as counts:
+                # the open prices that were just written, as a datetime by
+                # ticker array, so that the transactions can be priced
+                # without querying. From here on the dates are datetime64[s]
+                # and are only turned into python datetimes or strings by
+                # the loader.
+                prices = pd.concat(open_prices)
+                prices = prices[~prices.index.duplicated()].sort_index()
+                dates = prices.index.values.astype('datetime64[s]')
+                open_prices = prices.to_numpy()
+
+                # the chains of every investor and ticker, first the longs
+                # and then the shorts, ordered by investor and then by ticker
+                transactions = {
+                    'user_id': [],
+                    'datetime': [],
+                    'ticker': [],
+                    'position_type': [],
+                    'action': [],
+                    'no_shares': [],
+                }
+                # the chains are drawn over the positions of the dates, which
+                # index the rows of open_prices directly
+                date_ids, ticker_ids = [], []
+                for position_type, no_investments in [(1, 3), (-1, 2)]:
+                    chain, trans_date_ids, actions, trans_sizes = (
+                        transaction_chains(
+                            float(position_type),
+                            no_investments,
+                            np.arange(len(dates)),
+                            no_investors * len(tickers)
+                        )
+                    )
+                    transactions['user_id'].append(chain // len(tickers) + 1)
+                    date_ids.append(trans_date_ids)
+                    transactions['datetime'].append(dates[trans_date_ids])
+                    ticker_ids.append(chain % len(tickers))
+                    transactions['ticker'].append(
+                        np.array(tickers)[ticker_ids[-1]]
+                    )
+                    transactions['position_type'].append(
+                        np.full(len(chain), position_type)
+                    )
+                    transactions['action'].append(actions.astype(int))
+                    transactions['no_shares'].append(trans_sizes)
+                transactions = {
+                    k: np.hstack(v) for k, v in transactions.items()
+                }
+
+                date_ids = np.hstack(date_ids)
+                transactions['at_price'] = open_prices[
+                    date_ids, np.hstack(ticker_ids)
                 ]
 
-                sub_df.insert(1, 'ticker', np.repeat(ticker, len(sub_df)))
-                
-                # add a columns with just the ticker repeated
-                sub_df.columns = [
-                    x.lower() 
-                    for x in sub_df.columns.get_level_values('ohlcv').values
-                ]
-                cols = [
-                    'datetime', 'ticker', 'open',
-                    'high', 'low', 'close', 'volume', 'timestamp'
-                ]
-                
-                # push to the sql server
-                sub_df[cols].to_sql(
-                    'ohlcv', self.engine, if_exists='append', index=False)
-
-        query = f"select datetime from ohlcv"
-        dates = pd.read_sql(
-            query, self.engine
-        )['datetime'].values.astype(str)
-
-        session  = sessionmaker(bind=self.engine)()
-        
-        dates_used = np.array([])
-        for user_id in range(1, no_investors + 1):
-            
-            # num_longs = np.random.choice(np.arange(5))
-            num_longs = 3
-            long_invs = {
-                t: transaction_chain(1.0, num_longs, dates) for t in tickers
-            }
-
-
-            for ticker in long_invs.keys():
-                for trans in long_invs[ticker]:
-                    datetime, action, no_shares = trans
-                    dates_used = np.append(dates_used, datetime)
-                    l = datetime[:10]
-                    r = datetime[11: -10]
-                    query = f"select open from ohlcv "
-                    query += f"where datetime = '{l + ' ' + r}' "
-                    query += f"and ticker = '{ticker}'"
-                    at_price = pd.read_sql(
-                        query, self.engine
-                    )['open'].values[0]
-
-                    transaction = self.TransactionHistory(
-                        user_id,
-                        datetime, 
-                        ticker, 
-                        1,
-                        action, 
-                        no_shares,
-                        at_price
-                    )
-                    session.add(transaction)
-
-
-        for user_id in range(1, no_investors + 1):
-
-            # num_shorts = np.random.choice(np.arange(5))
-            num_shorts = 2
-            short_invs = {
-                t: transaction_chain(-1.0, num_shorts, dates) for t in tickers
-            }
-
-            for ticker in short_invs.keys():
-                for trans in short_invs[ticker]:
-                    datetime, action, no_shares = trans 
-                    dates_used = np.append(dates_used, datetime)
-                    l = datetime[:10]
-                    r = datetime[11: -10]
-                    query = f"select open from ohlcv "
-                    query += f"where datetime = '{l + ' ' + r}' "
-                    query += f"and ticker = '{ticker}'"
-                    open = pd.read_sql(
-                        query, self.engine
-                    )['open'].values[0]
-
-                    transaction = self.TransactionHistory(
-                        user_id, 
-                        datetime, 
-                        ticker, 
-                        -1, 
-                        action, 
-                        no_shares, 
-                        open
+                # a heap has no autoincrement column until its primary key
+                # is added
+                if (
+                    trans_id.autoincrement is False
+                    or 'transaction_history' in heaps
+                ):
+                    transactions['trans_id'] = np.arange(1, len(date_ids) + 1)
+                counts['rows'] = len(date_ids)
+
+            sink.write(
+                {self.TransactionHistory.__table__: transactions}, 0, phases
+            )
+
+        if build_portfolio:
+            with phases.phase('portfolio'):
+                with phases.phase('generate') as counts:
+                    portfolio = portfolio_replay(
+                        transactions['user_id'],
+                        transactions['ticker'],
+                        transactions['position_type'],
+                        transactions['action'],
+                        transactions['no_shares'],
+                        transactions['at_price'],
                     )
-                    session.add(transaction)
+                    gain = portfolio['gain'].astype(object)
+                    gain[np.isnan(portfolio['gain'])] = None
+                    portfolio['gain'] = gain
+                    counts['rows'] = len(gain)
+
+                sink.write({self.Portfolio.__table__: portfolio}, 0, phases)
+
+        # the keys are added before the nans, which update ohlcv by datetime
+        if heaps:
+            with phases.phase('create_constraints'):
+                create_constraints(self.engine, self.base.metadata, heaps)
 
         if make_nans > 0:
-            dates_not_used = np.setdiff1d(dates, dates_used)
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                rm_dates = np.random.choice(dates_not_used, make_nans)
-                for date in rm_dates:
-                    l = date[:10]
-                    r = date[11: -10]
-                    date = l + ' ' + r
-                    in_a_row = np.random.randint(1, max_nans_in_a_row)
-                    for i in range(in_a_row):
-                        d = dt.datetime.strptime(
-                            date, '%Y-%m-%d %H:%M:%S'
-                        ) + dt.timedelta(seconds=60 * i)
-                        d = dt.datetime.strftime(d, '%Y-%m-%d %H:%M:%S')
-                        with self.engine.connect() as conn:
-                            query = f"update ohlcv "
-                            query += f"set {col} = NULL "
-                            query += f"where datetime = '{d}'"
-                            conn.execute(
-                                db.text(query)
+            with phases.phase('nans'):
+                self._make_nans(
+                    dates, date_ids, make_nans, max_nans_in_a_row,
+                    sink, database, ohlcv_parts, phases
+                )
+
+        if database:
+            with phases.phase('create_indexes'):
+                create_indexes(self.engine, self.base.metadata)
+
+        phases.finish()
+        return phases.timings
+
+    def refresh(
+        self,
+        tickers: list[str] | NoneType = None,
+        end: dt.datetime | NoneType = None,
+        time_step: str = '1m',
+        start: dt.datetime | NoneType = None,
+        price_source=None,
+        prefetch: int = 2,
+        cache_dir: str | NoneType = None,
+        offline: bool = False,
+        listener=None,
+    ):
+        """
+        This function brings the ohlcv table of an existing database up to
+        date. It looks up the last stored bar of each ticker, fetches only
+        the bars from that bar up to end and upserts them. The last stored
+        bar, which may have been fetched before it closed, is updated and
+        the bars after it are inserted, so a refresh over a range that is
+        already stored neither fails on the primary key nor fetches the
+        range again. The tickers with the same last bar are fetched
+        together. The transaction_history and portfolio tables are not
+        changed. The upsert needs MySQL, PostgreSQL or SQLite, see
+        dbgen.loaders.upsert, and any other database raises a ValueError
+        before anything is fetched.
+
+        Parameters
+        --------------------------------------------------
+        tickers : list of str, Default None
+            The tickers to refresh. If None, every ticker in ohlcv.
+
+        end : datetime, Default None
+            The end of the refresh. If None, now.
+
+        time_step : str, Default '1m'
+            The time step of the stored bars.
+
+        start : datetime, Default None
+            Where the tickers that are not in ohlcv yet start. Required if
+            there are any.
+
+        price_source, prefetch, cache_dir, offline
+            See initialize.
+
+        listener : callable, Default None
+            See initialize. The phases are the lookup of the last bars and
+            the download, transform and upsert of each window.
+
+        returns:
+            The time in seconds spent looking up the last bars and fetching
+            and writing the new ones as a dictionary.
+
+        Example Usage
+        --------------------------------------------------
+        import sqlalchemy as db
+
+        investor_returns = InvestorReutrns(db.create_engine("..."))
+        investor_returns.refresh(cache_dir='~/.cache/dbgen/prices')
+        """
+        # fail before any prices are downloaded
+        check_upsert(self.engine.dialect.name)
+
+        price_source = _price_source(price_source, cache_dir, offline)
+        if end is None:
+            end = dt.datetime.now().replace(second=0, microsecond=0)
+
+        phases = Phases(listener)
+        ohlcv = self.OHLCV.__table__
+
+        with phases.phase('last_bars'):
+            with self.engine.connect() as conn:
+                last_bars = dict(
+                    conn.execute(
+                        db.select(
+                            ohlcv.c.ticker, db.func.max(ohlcv.c.datetime)
+                        ).group_by(ohlcv.c.ticker)
+                    ).all()
+                )
+
+        if tickers is None:
+            tickers = sorted(last_bars)
+        new_tickers = [t for t in tickers if t not in last_bars]
+        if new_tickers and start is None:
+            raise ValueError(
+                "start is required for the tickers that are not in ohlcv "
+                f"yet, {new_tickers}."
+            )
+
+        groups = {}
+        for ticker in tickers:
+            groups.setdefault(last_bars.get(ticker, start), []).append(ticker)
+
+        # the same windows as in initialize
+        batch_time = 60 * 60 * 24 * 5
+
+        with phases.phase('ohlcv'):
+            for first, group in sorted(groups.items()):
+                if first >= end:
+                    continue
+
+                for batch_no, _, df in phases.iterate(
+                    'download',
+                    download_windows(
+                        price_source,
+                        group,
+                        first,
+                        end,
+                        time_step,
+                        batch_time,
+                        prefetch=prefetch
+                    )
+                ):
+                    if len(df) == 0:
+                        continue
+
+                    with phases.phase('transform', part=batch_no) as counts:
+                        columns = _long_ohlcv(df, group)
+                        # a source may return bars from before the last
+                        # stored bar, ie from the start of its day
+                        keep = columns['datetime'] >= np.datetime64(first, 's')
+                        columns = {k: v[keep] for k, v in columns.items()}
+                        counts['rows'] = int(keep.sum())
+
+                    with phases.phase('upsert', part=batch_no) as counts:
+                        with self.engine.begin() as conn:
+                            counts['rows'] = upsert(conn, ohlcv, columns)
+
+        phases.finish()
+        return phases.timings
+
+    def _make_nans(
+        self,
+        dates,
+        date_ids,
+        make_nans,
+        max_nans_in_a_row,
+        sink,
+        database,
+        ohlcv_parts,
+        phases
+    ):
+        """
+        Sets gaps of NaN into the ohlcv columns at dates without a
+        transaction.
+        """
+        unused = np.ones(len(dates), dtype=bool)
+        unused[date_ids] = False
+        gaps = nan_gaps(dates[unused], make_nans, max_nans_in_a_row)
+
+        ohlcv = self.OHLCV.__table__
+        if not database:
+            # the parts of ohlcv with a gap are read back and written again
+            for part in ohlcv_parts:
+                df = sink.read(ohlcv, part)
+                datetime = pd.to_datetime(df['datetime']).values.astype(
+                    'datetime64[s]'
+                )
+                in_gap = {
+                    col: np.isin(datetime, targets)
+                    for col, targets in gaps.items()
+                }
+                if not any(mask.any() for mask in in_gap.values()):
+                    continue
+                for col, mask in in_gap.items():
+                    df.loc[mask, col] = np.nan
+                columns = {col: df[col].to_numpy() for col in df.columns}
+                columns['datetime'] = datetime
+                sink.write({ohlcv: columns}, part, phases)
+            return
+
+        # the gaps are loaded into a temporary table and applied with one
+        # update per column, rather than one update per minute
+        targets = db.Table(
+            'nan_targets',
+            db.MetaData(),
+            db.Column('datetime', db.DateTime()),
+            db.Column('ohlcv', db.String(6)),
+            prefixes=['TEMPORARY']
+        )
+        with self.engine.begin() as conn:
+            targets.create(conn)
+            with phases.phase('insert', table=targets.name) as counts:
+                counts['rows'] = load(
+                    conn,
+                    targets,
+                    {
+                        'datetime': np.hstack(list(gaps.values())),
+                        'ohlcv': np.repeat(
+                            list(gaps.keys()), [len(g) for g in gaps.values()]
+                        ),
+                    }
+                )
+            for col in gaps.keys():
+                with phases.phase('update', column=col) as counts:
+                    counts['rows'] = conn.execute(
+                        db.update(ohlcv).where(
+                            ohlcv.c.datetime.in_(
+                                db.select(targets.c.datetime).where(
+                                    targets.c.ohlcv == col
+                                )
                             )
-                            conn.commit()
+                        ).values({col: None})
+                    ).rowcount
+            targets.drop(conn)
 
-        session.commit()
-        session.close()
 
-        return None
+def _price_source(price_source, cache_dir, offline):
+    """
+    The price source, YahooPriceSource if None, wrapped in a
+    CachedPriceSource if there is a cache_dir.
+    """
+    if price_source is None:
+        price_source = YahooPriceSource()
+
+    if cache_dir is not None:
+        price_source = CachedPriceSource(
+            price_source, cache_dir, offline=offline
+        )
+    elif offline:
+        raise ValueError("offline requires a cache_dir.")
+
+    return price_source
+
+
+def _long_ohlcv(df, tickers):
+    """
+    Turns a window of prices in the format of yfinance.download into the
+    columns of the ohlcv table, ticker by ticker. The prices of each ticker
+    are interpolated over the window.
+    """
+    if df.columns.nlevels == 1:
+        col = pd.MultiIndex.from_product([df.columns.values, tickers])
+        df = df.set_axis(col, axis=1)
+
+    # the wall clock time without the timezone that yfinance gives and the
+    # unix timestamp of the true utc time
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        utc = index.tz_convert('UTC').tz_localize(None)
+        index = index.tz_localize(None)
+    else:
+        utc = index
+    wall = index.values.astype('datetime64[s]')
+    epoch = utc.values.astype('datetime64[s]').astype(np.int64)
+
+    # interpolating the wide frame interpolates each ticker on its own
+    fields = ['Open', 'High', 'Low', 'Close', 'Volume']
+    values = df.loc[:, fields].astype(float).interpolate()
+
+    # stack into one long frame, ticker by ticker
+    no_rows = len(index)
+    columns = {
+        'datetime': np.tile(wall, len(tickers)),
+        'ticker': np.repeat(tickers, no_rows),
+    }
+    for field in fields:
+        columns[field.lower()] = values[field].reindex(
+            columns=tickers
+        ).to_numpy().T.reshape(-1)
+    columns['timestamp'] = np.tile(epoch, len(tickers))
+
+    return columns
 
 
 def OHLCV(base) -> DeclarativeMeta:
@@ -436,6 +794,10 @@ def OHLCV(base) -> DeclarativeMeta:
         close = db.Column(db.Float())
         volume = db.Column(db.Float())
         timestamp = db.Column(db.Integer())
+
+        __table_args__ = (
+            db.Index('ix_ohlcv_ticker_datetime', 'ticker', 'datetime'),
+        )
      
         def __init__(
             self,
@@ -1,5 +1,16 @@
 from .utils import (
     convert_sql_to_string, 
     longest_chain_of_nans, 
-    transaction_chain
+    nan_gaps,
+    nan_runs,
+    portfolio_replay,
+    transaction_chain,
+    transaction_chains
 )
+from .price_sources import (
+    CachedPriceSource,
+    FramePriceSource,
+    YahooPriceSource,
+    download_windows
+)
+from .synthetic import SyntheticPriceSource
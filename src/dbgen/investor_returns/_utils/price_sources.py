@@ -0,0 +1,452 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import datetime as dt
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+class YahooPriceSource:
+    """
+    The default price source. Scrapes the prices from yahoo with
+    yfinance.download.
+
+    Parameters
+    --------------------------------------------------
+    prepost : boolean, Default True
+        Include the pre and post market prices.
+
+    Methods
+    --------------------------------------------------
+    fetch
+        Returns the ohlcv frame of the tickers between start and end.
+    """
+
+    def __init__(self, prepost=True):
+        self.prepost = prepost
+
+    def fetch(self, tickers, start, end, interval):
+        """
+        Parameters
+        --------------------------------------------------
+        tickers : list of str
+
+        start : datetime
+
+        end : datetime
+
+        interval : str
+            The time step of the bars, ie '1m'.
+
+        Returns
+        --------------------------------------------------
+        pd.DataFrame
+            A frame in the format of yfinance.download, ie a datetime index
+            and (ohlcv, ticker) columns.
+        """
+        # yfinance is slow to import and only needed to scrape
+        import yfinance as yf
+
+        return yf.download(
+            tickers=tickers,
+            start=start,
+            end=end,
+            interval=interval,
+            prepost=self.prepost
+        )
+
+
+class FramePriceSource:
+    """
+    A price source that serves the prices from a frame that is already in
+    memory, for example a local fixture. This allows the database to be built
+    offline.
+
+    Parameters
+    --------------------------------------------------
+    df : pd.DataFrame
+        A frame in the format of yfinance.download, ie a datetime index and
+        (ohlcv, ticker) columns.
+
+    Methods
+    --------------------------------------------------
+    fetch
+        Returns the rows of the tickers between start and end.
+
+    from_csv
+        Builds the source from a csv that was written with df.to_csv.
+
+    Example Usage
+    --------------------------------------------------
+    import yfinance as yf
+
+    df = yf.download(['SPY', 'NVDA'], interval='1m', period='5d', prepost=True)
+    df.to_csv('fixture.csv')
+
+    source = FramePriceSource.from_csv('fixture.csv')
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+    @classmethod
+    def from_csv(cls, path, tz='America/New_York'):
+        """
+        Reads a csv written by df.to_csv where df is in the format of
+        yfinance.download. The datetimes are converted to the timezone tz,
+        which is the timezone yfinance uses for US stocks.
+        """
+        df = pd.read_csv(path, header=[0, 1], index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True).tz_convert(tz)
+        df.index.name = 'Datetime'
+        return cls(df)
+
+    def fetch(self, tickers, start, end, interval):
+        index = self.df.index
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if index.tz is not None and start.tz is None:
+            start = start.tz_localize(index.tz)
+            end = end.tz_localize(index.tz)
+        rows = (index >= start) & (index < end)
+        cols = self.df.columns.get_level_values(1).isin(tickers)
+        return self.df.loc[rows, cols]
+
+
+class CachedPriceSource:
+    """
+    A price source that keeps the prices of another price source in a cache
+    on disk and only fetches what is not in the cache yet. The prices of each
+    ticker are stored as one .npz file per month under
+    directory/interval/ticker/ and a manifest.json in directory/interval
+    records the time ranges of each ticker that have already been fetched.
+    Rebuilding a database over the same time range therefore does not touch
+    the network at all and extending the time range only fetches the new
+    part. A time range is only recorded for the tickers that the source
+    returned prices for, so a failed download is fetched again next time.
+
+    Parameters
+    --------------------------------------------------
+    source : price source, Default YahooPriceSource()
+        The price source that is called on a cache miss.
+
+    directory : str, Default '~/.cache/dbgen/prices'
+        The directory of the cache.
+
+    offline : boolean, Default False
+        If true, the source is never called and a FileNotFoundError is raised
+        as soon as some of the requested prices are not in the cache.
+
+    tz : str, Default 'America/New_York'
+        The timezone of the returned frames.
+
+    Methods
+    --------------------------------------------------
+    fetch
+        Returns the ohlcv frame of the tickers between start and end, fetching
+        the missing time ranges from the source first.
+
+    check
+        Raises a FileNotFoundError if some of the requested prices are not in
+        the cache.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+    from dbgen.investor_returns import create
+
+    source = CachedPriceSource(directory='./prices')
+
+    # the first call fills the cache and later calls can run offline
+    create(db.create_engine("..."), price_source=source)
+    create(
+        db.create_engine("..."),
+        price_source=CachedPriceSource(directory='./prices', offline=True)
+    )
+    """
+
+    fields = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    def __init__(self,
+                 source=None,
+                 directory='~/.cache/dbgen/prices',
+                 offline=False,
+                 tz='America/New_York'):
+        self.source = YahooPriceSource() if source is None else source
+        self.directory = os.path.expanduser(directory)
+        self.offline = offline
+        self.tz = tz
+        self._lock = threading.Lock()
+
+    def fetch(self, tickers, start, end, interval):
+        naive = pd.Timestamp(start).tz is None
+        missing = self._missing(tickers, start, end, interval)
+        if missing and self.offline:
+            self.check(tickers, start, end, interval)
+        start, end = self._utc_ns(start), self._utc_ns(end)
+
+        for (gap_start, gap_end), gap_tickers in missing.items():
+            df = self.source.fetch(
+                gap_tickers,
+                self._timestamp(gap_start, naive),
+                self._timestamp(gap_end, naive),
+                interval
+            )
+            # nothing after now is marked as cached, it may still come
+            now = pd.Timestamp.now(tz='UTC').value
+            with self._lock:
+                written = self._write(df, gap_tickers, interval)
+                manifest = self._read_manifest(interval)
+                # yfinance returns an empty frame rather than raising when a
+                # download fails, so a gap is only marked as cached for the
+                # tickers that the source returned prices for
+                for ticker in written:
+                    manifest[ticker] = _merge(
+                        manifest.get(ticker, []) 
+                        + [[gap_start, min(gap_end, now)]]
+                    )
+                self._write_manifest(interval, manifest)
+
+        with self._lock:
+            frames = {
+                ticker: self._read(ticker, interval, start, end)
+                for ticker in tickers
+            }
+
+        df = pd.concat(frames, axis=1).swaplevel(axis=1)
+        df = df.reindex(
+            columns=pd.MultiIndex.from_product([self.fields, tickers])
+        ).sort_index()
+        df.index = pd.DatetimeIndex(
+            df.index.values.astype('datetime64[ns]'), name='Datetime'
+        ).tz_localize('UTC').tz_convert(self.tz)
+        return df
+
+    def check(self, tickers, start, end, interval):
+        """
+        Raises a FileNotFoundError if some of the prices of the tickers
+        between start and end are not in the cache.
+        """
+        missing = self._missing(tickers, start, end, interval)
+        if missing:
+            raise FileNotFoundError(
+                f"The prices of {sorted(set(sum(missing.values(), [])))} "
+                f"are not cached in {self.directory}."
+            )
+
+    def _missing(self, tickers, start, end, interval):
+        """
+        The time ranges that are not in the cache yet, as utc nanoseconds,
+        with the tickers that are missing them.
+        """
+        start, end = self._utc_ns(start), self._utc_ns(end)
+        with self._lock:
+            manifest = self._read_manifest(interval)
+
+        missing = {}
+        for ticker in tickers:
+            for gap in _subtract(manifest.get(ticker, []), start, end):
+                missing.setdefault(gap, []).append(ticker)
+        return missing
+
+    def _utc_ns(self, time):
+        time = pd.Timestamp(time)
+        if time.tz is None:
+            time = time.tz_localize(self.tz)
+        return time.tz_convert('UTC').value
+
+    def _timestamp(self, ns, naive):
+        time = pd.Timestamp(ns, tz='UTC').tz_convert(self.tz)
+        return time.tz_localize(None).to_pydatetime() if naive else time
+
+    def _path(self, interval, *names):
+        return os.path.join(self.directory, interval, *names)
+
+    def _read_manifest(self, interval):
+        path = self._path(interval, 'manifest.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return json.load(file)
+
+    def _write_manifest(self, interval, manifest):
+        _replace(
+            self._path(interval, 'manifest.json'),
+            lambda file: file.write(json.dumps(manifest).encode())
+        )
+
+    def _write(self, df, tickers, interval):
+        """
+        Merges the rows of each ticker of df into the monthly files and
+        returns the tickers that df had prices for.
+        """
+        written = []
+        if len(df) == 0:
+            return written
+        if df.columns.nlevels == 1:
+            df = df.set_axis(
+                pd.MultiIndex.from_product([df.columns.values, tickers]), 
+                axis=1
+            )
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize(self.tz)
+        times = index.tz_convert('UTC').tz_localize(None).values.astype(
+            'datetime64[ns]'
+        ).astype(np.int64)
+        months = index.tz_convert('UTC').strftime('%Y-%m').values
+
+        for ticker in tickers:
+            values = df.loc[:, self.fields].astype(float).reindex(
+                columns=pd.MultiIndex.from_product([self.fields, [ticker]])
+            ).to_numpy()
+            # rows without any price are rows where only other tickers traded
+            keep = ~np.isnan(values).all(axis=1)
+            if keep.any():
+                written.append(ticker)
+            for month in np.unique(months[keep]):
+                rows = keep & (months == month)
+                new = pd.DataFrame(
+                    values[rows], index=times[rows], columns=self.fields
+                )
+                old = self._read_month(ticker, interval, month)
+                merged = pd.concat([old, new])
+                merged = merged[
+                    ~merged.index.duplicated(keep='last')
+                ].sort_index()
+                _replace(
+                    self._path(interval, ticker, f'{month}.npz'),
+                    lambda file: np.savez(
+                        file,
+                        datetime=merged.index.values,
+                        **{f: merged[f].to_numpy() for f in self.fields}
+                    )
+                )
+
+        return written
+
+    def _read_month(self, ticker, interval, month):
+        path = self._path(interval, ticker, f'{month}.npz')
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=self.fields, dtype=float)
+        with np.load(path) as data:
+            return pd.DataFrame(
+                {f: data[f] for f in self.fields}, index=data['datetime']
+            )
+
+    def _read(self, ticker, interval, start, end):
+        months = pd.period_range(
+            pd.Timestamp(start, tz='UTC').tz_localize(None),
+            pd.Timestamp(end - 1, tz='UTC').tz_localize(None),
+            freq='M'
+        ).strftime('%Y-%m')
+        df = pd.concat([
+            self._read_month(ticker, interval, month) for month in months
+        ])
+        return df[(df.index >= start) & (df.index < end)]
+
+
+def _subtract(ranges, start, end):
+    """
+    The parts of [start, end) that are not covered by the sorted and
+    disjoint ranges.
+    """
+    gaps = []
+    for r_start, r_end in ranges:
+        if r_start > start:
+            gaps.append((start, min(r_start, end)))
+        start = max(start, r_end)
+        if start >= end:
+            break
+    if start < end:
+        gaps.append((start, end))
+    return gaps
+
+
+def _merge(ranges):
+    """
+    Merges overlapping and touching ranges.
+    """
+    merged = []
+    for r_start, r_end in sorted(ranges):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], r_end)
+        elif r_start < r_end:
+            merged.append([r_start, r_end])
+    return merged
+
+
+def _replace(path, write):
+    """
+    Writes a file through a temporary file so that a crash never leaves a
+    half written file in the cache.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as file:
+        write(file)
+    os.replace(tmp, path)
+
+
+def download_windows(source, tickers, start, end, interval, batch_time,
+                     prefetch=2):
+    """
+    Splits start to end into windows of batch_time seconds and fetches each
+    window from the price source in a thread pool. Up to prefetch windows are
+    fetched ahead of the window that is being consumed, so the network time
+    overlaps with whatever the caller does with the previous window while the
+    memory stays bounded.
+
+    Parameters
+    --------------------------------------------------
+    source : price source
+        An object with a fetch(tickers, start, end, interval) method, ie
+        YahooPriceSource or FramePriceSource.
+
+    tickers : list of str
+
+    start : datetime
+
+    end : datetime
+
+    interval : str
+
+    batch_time : int
+        The length of a window in seconds.
+
+    prefetch : int, Default 2
+        The number of windows that are fetched ahead.
+
+    Yields
+    --------------------------------------------------
+    (batch_no, no_batches, df)
+        The windows in order.
+    """
+    elapsed_time = (end - start).total_seconds()
+    windows = []
+    batch_no = 0
+    while batch_no * batch_time < elapsed_time:
+        batch_no += 1
+        windows.append((
+            start + dt.timedelta(seconds=batch_time * (batch_no - 1)),
+            min(start + dt.timedelta(seconds=batch_time * batch_no), end)
+        ))
+
+    no_batches = len(windows)
+
+    with ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+        in_flight = deque()
+        for batch_no, (w_start, w_end) in enumerate(windows, start=1):
+            in_flight.append((
+                batch_no,
+                executor.submit(
+                    source.fetch, tickers, w_start, w_end, interval
+                )
+            ))
+            if len(in_flight) > prefetch:
+                batch_no, future = in_flight.popleft()
+                yield batch_no, no_batches, future.result()
+        while in_flight:
+            batch_no, future = in_flight.popleft()
+            yield batch_no, no_batches, future.result()
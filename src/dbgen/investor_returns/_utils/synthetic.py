@@ -0,0 +1,299 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+
+class SyntheticPriceSource:
+    """
+    A price source that makes up the prices instead of downloading them. The
+    log price of each ticker follows a geometric Brownian motion. Each day
+    starts from the level of a daily random walk plus a small overnight gap
+    and then moves minute by minute as a Brownian bridge to the level of the
+    next day. The volume follows a U shaped intraday curve with a much lower
+    volume before and after the market.
+
+    Every random number is a hash of the seed, the ticker, the day and the
+    minute rather than a draw from a stateful generator, so the prices of a
+    ticker on a day are the same no matter which time window or which other
+    tickers they were requested with, and any number of tickers and years can
+    be generated one window at a time.
+
+    Parameters
+    --------------------------------------------------
+    seed : int, Default 0
+
+    prepost : boolean, Default True
+        Include the bars from 4:00 to 9:30 and from 16:00 to 20:00.
+
+    sigma : float, Default 0.3
+        The yearly volatility.
+
+    mu : float, Default 0.05
+        The yearly drift.
+
+    tz : str, Default 'America/New_York'
+        The timezone of the market.
+
+    Methods
+    --------------------------------------------------
+    fetch
+        Returns the ohlcv frame of the tickers between start and end.
+
+    Example Usage
+    --------------------------------------------------
+    import datetime as dt
+    import sqlalchemy as db
+    from dbgen.investor_returns import create
+
+    tickers = [f'T{i:04d}' for i in range(1000)]
+
+    create(
+        db.create_engine("..."),
+        tickers=tickers,
+        start=dt.datetime(2020, 1, 1),
+        end=dt.datetime(2023, 1, 1),
+        price_source=SyntheticPriceSource(seed=0)
+    )
+    """
+
+    intervals = {
+        '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60,
+        '90m': 90, '1h': 60
+    }
+
+    # minutes after 4:00 of the open and close of the regular session
+    _open, _close, _minutes = 330, 720, 960
+
+    # the day, in days since 1970-01-01, at which the price of a ticker is
+    # its starting price
+    _anchor = 18262
+
+    def __init__(self,
+                 seed=0,
+                 prepost=True,
+                 sigma=0.3,
+                 mu=0.05,
+                 tz='America/New_York'):
+        self.seed = seed
+        self.prepost = prepost
+        self.sigma = sigma
+        self.mu = mu
+        self.tz = tz
+
+    def fetch(self, tickers, start, end, interval):
+        if interval not in self.intervals:
+            raise ValueError(
+                f"interval must be one of {list(self.intervals)}."
+            )
+        step = self.intervals[interval]
+
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if start.tz is None:
+            start, end = start.tz_localize(self.tz), end.tz_localize(self.tz)
+        start, end = start.tz_convert(self.tz), end.tz_convert(self.tz)
+
+        days = pd.date_range(
+            start.tz_localize(None).normalize(),
+            end.tz_localize(None).normalize(),
+            freq='B'
+        )
+        first, last = (0, self._minutes) if self.prepost else (
+            self._open, self._close
+        )
+        bar_starts = np.arange(first, last, step)
+        columns = pd.MultiIndex.from_product([
+            ['Open', 'High', 'Low', 'Close', 'Volume'], tickers
+        ])
+        if len(days) == 0 or len(tickers) == 0:
+            return pd.DataFrame(
+                columns=columns,
+                index=pd.DatetimeIndex([], name='Datetime', tz=self.tz),
+                dtype=float
+            )
+
+        times = pd.DatetimeIndex(
+            (
+                days.values[:, None]
+                + np.timedelta64(4, 'h')
+                + bar_starts[None, :].astype('timedelta64[m]')
+            ).reshape(-1)
+        ).tz_localize(self.tz)
+        keep = (times >= start) & (times < end)
+
+        keys = np.array(
+            [zlib.crc32(ticker.encode()) for ticker in tickers],
+            dtype=np.uint64
+        )
+        day_nos = days.values.astype('datetime64[D]').astype(np.int64)
+        bars = self._bars(keys, day_nos, first, last, step)
+
+        return pd.DataFrame(
+            np.hstack([
+                field.reshape((len(tickers), -1)).T[keep] for field in bars
+            ]),
+            index=pd.DatetimeIndex(times[keep], name='Datetime'),
+            columns=columns
+        )
+
+    def _bars(self, keys, day_nos, first, last, step):
+        """
+        The open, high, low, close and volume of the bars of every ticker and
+        day as arrays of shape (tickers, days, bars).
+        """
+        minute_sigma = self.sigma / np.sqrt(252 * 390)
+
+        # the log level at 4:00 of each day and of the calendar day after
+        level = self._levels(keys, np.hstack((day_nos, day_nos + 1)))
+        gap = minute_sigma * 5 * _normal(self.seed, keys[:, None], day_nos, 1)
+        start_level = level[:, : len(day_nos)] + gap
+        end_level = level[:, len(day_nos):]
+
+        # a Brownian bridge through the minutes of the day
+        minutes = np.arange(self._minutes + 1)
+        steps = minute_sigma * _normal(
+            self.seed, keys[:, None, None], day_nos[:, None], minutes[1:], 2
+        )
+        walk = np.concatenate(
+            (np.zeros(steps.shape[:2] + (1,)), np.cumsum(steps, axis=2)),
+            axis=2
+        )
+        t = minutes / self._minutes
+        path = (
+            start_level[:, :, None]
+            + walk - t * walk[:, :, -1:]
+            + t * (end_level - start_level)[:, :, None]
+        )
+
+        # each bar goes from the price at its start to the price at its end
+        # and its high and low overshoot the path by a random amount
+        bar_starts = np.arange(first, last, step)
+        bar_ends = np.minimum(bar_starts + step, last)
+        segments = path[:, :, first: last]
+        high = np.maximum(
+            np.maximum.reduceat(segments, bar_starts - first, axis=2),
+            path[:, :, bar_ends]
+        )
+        low = np.minimum(
+            np.minimum.reduceat(segments, bar_starts - first, axis=2),
+            path[:, :, bar_ends]
+        )
+        wick = minute_sigma * np.sqrt(step) / 2
+        high += wick * np.abs(_normal(
+            self.seed, keys[:, None, None], day_nos[:, None], bar_starts, 3
+        ))
+        low -= wick * np.abs(_normal(
+            self.seed, keys[:, None, None], day_nos[:, None], bar_starts, 4
+        ))
+
+        # the volume of each minute follows a U over the regular session
+        # and is a twentieth of the open before and after it
+        session = (minutes[:-1] - self._open) / (self._close - self._open)
+        curve = np.where(
+            (session >= 0) & (session < 1),
+            1 + 3 * (2 * session - 1) ** 2,
+            0.05
+        )
+        base = 10 ** (3 + 2 * _uniform(self.seed, keys, 5))
+        noise = np.exp(0.5 * _normal(
+            self.seed, keys[:, None, None], day_nos[:, None], minutes[:-1], 6
+        ))
+        minute_volume = np.round(base[:, None, None] * curve * noise)
+        volume = np.add.reduceat(
+            minute_volume[:, :, first: last], bar_starts - first, axis=2
+        )
+
+        return (
+            np.exp(path[:, :, bar_starts]),
+            np.exp(high),
+            np.exp(low),
+            np.exp(path[:, :, bar_ends]),
+            volume
+        )
+
+    def _levels(self, keys, day_nos):
+        """
+        The log price of each ticker at 4:00 of each day. The levels are a
+        random walk over the calendar days since 1970-01-01. The walk is
+        built from blocks of 256 days, where the sum of each block is drawn
+        first and the days of a block are a Brownian bridge between the
+        sums, so a level only needs the blocks up to it and the days of its
+        own block.
+        """
+        if day_nos.min() < 0:
+            raise ValueError("SyntheticPriceSource starts at 1970-01-01.")
+
+        day_sigma = self.sigma / np.sqrt(365)
+        block_sigma = day_sigma * 16
+
+        def walk(day_nos):
+            blocks = day_nos // 256
+            offsets = day_nos % 256
+
+            block_sums = block_sigma * _normal(
+                self.seed, keys[:, None], np.arange(blocks.max() + 1), 7
+            )
+            before = np.cumsum(block_sums, axis=1) - block_sums
+
+            inside = np.zeros((len(keys), len(day_nos)))
+            for block in np.unique(blocks):
+                days = blocks == block
+                steps = day_sigma * _normal(
+                    self.seed, keys[:, None], block * 256 + np.arange(256), 8
+                )
+                cumulative = np.hstack(
+                    (np.zeros((len(keys), 1)), np.cumsum(steps, axis=1))
+                )
+                t = offsets[days] / 256
+                inside[:, days] = (
+                    cumulative[:, offsets[days]]
+                    - t * cumulative[:, -1:]
+                    + t * block_sums[:, block: block + 1]
+                )
+
+            return before[:, blocks] + inside
+
+        start_price = np.exp(
+            np.log(10) + np.log(50) * _uniform(self.seed, keys, 9)
+        )
+        drift = (self.mu - self.sigma ** 2 / 2) / 365
+        return (
+            np.log(start_price)[:, None]
+            + walk(day_nos) - walk(np.array([self._anchor]))
+            + drift * (day_nos - self._anchor)
+        )
+
+
+def _mix(x):
+    x = x * np.uint64(0x9E3779B97F4A7C15)
+    x = x ^ (x >> np.uint64(29))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    return x ^ (x >> np.uint64(32))
+
+
+def _hash(*keys):
+    """
+    A 64 bit hash of the keys. The keys are broadcast against each other.
+    """
+    x = np.uint64(0x2545F4914F6CDD1D)
+    with np.errstate(over='ignore'):
+        for key in keys:
+            x = _mix(x ^ np.asarray(key).astype(np.uint64))
+    return x
+
+
+def _uniform(*keys):
+    """
+    Uniform numbers in (0, 1) that only depend on the keys.
+    """
+    return ((_hash(*keys) >> np.uint64(11)).astype(float) + 0.5) / 2 ** 53
+
+
+def _normal(*keys):
+    """
+    Standard normal numbers that only depend on the keys, from the Box-Muller
+    transform of the two 32 bit halves of their hash.
+    """
+    x = _hash(*keys)
+    u1 = ((x >> np.uint64(32)).astype(float) + 0.5) / 2 ** 32
+    u2 = ((x & np.uint64(0xFFFFFFFF)).astype(float) + 0.5) / 2 ** 32
+    return np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
@@ -1,3 +1,4 @@
+import sqlalchemy as db
 import numpy as np
 import pandas as pd
 
@@ -155,6 +156,260 @@ def transaction_chain(
     return trans_history
 
 
+def transaction_chains(
+    trans_type,
+    no_investments,
+    dates,
+    no_chains
+    ):
+    """
+    A batched version of transaction_chain. This function produces no_chains
+    independent chains of transactions in one pass over numpy arrays rather
+    than one python loop per chain. Each chain follows the same rules as
+    transaction_chain, so for a long position there are never more shares
+    sold than bought and for a short position there are never more shares
+    returned than borrowed.
+
+    Parameters
+    --------------------------------------------------
+    trans_type: float
+        Indicates whether the transaction is for a short or long position.
+        1.0 indicates a long and -1.0 indicates a short.
+
+    no_investments: int
+        The maximum number of transactions in a chain.
+
+    dates: np.array
+        The dates to pick the transaction dates from. Needs at least
+        no_investments distinct dates.
+
+    no_chains: int
+        The number of chains.
+
+    Returns
+    --------------------------------------------------
+    chain: np.array of int
+        The chain, 0, ..., no_chains - 1, that each transaction belongs to.
+        The transactions are ordered by chain and then by date.
+
+    trans_dates: np.array
+        The date of each transaction.
+
+    actions: np.array of float
+        1.0 for a buy and -1.0 for a sell.
+
+    trans_sizes: np.array of int
+        The size of each transaction.
+
+    Example Usage
+    --------------------------------------------------
+    # the long transactions of 5 investors in 3 tickers
+    chain, trans_dates, actions, trans_sizes = transaction_chains(
+        1.0, 3, dates, 5 * 3
+    )
+    """
+    dates = np.sort(dates)
+    if len(dates) < no_investments:
+        raise ValueError(
+            f"At least {no_investments} dates are needed for each chain."
+        )
+
+    # distinct dates for each chain, redrawing the rare chains with repeats
+    date_ids = np.sort(
+        np.random.randint(0, len(dates), size=(no_chains, no_investments)),
+        axis=1
+    )
+    repeats = (np.diff(date_ids, axis=1) == 0).any(axis=1)
+    while repeats.any():
+        date_ids[repeats] = np.sort(
+            np.random.randint(
+                0, len(dates), size=(repeats.sum(), no_investments)
+            ),
+            axis=1
+        )
+        repeats = (np.diff(date_ids, axis=1) == 0).any(axis=1)
+
+    first_trans_size = np.random.randint(20, 500, size=no_chains)
+    actions = np.hstack((
+        np.full((no_chains, 1), trans_type),
+        np.random.choice([1.0, -1.0], size=(no_chains, no_investments - 1))
+    ))
+    trans_sizes = np.hstack((
+        first_trans_size[:, None],
+        np.random.randint(
+            1, first_trans_size[:, None], size=(no_chains, no_investments - 1)
+        )
+    ))
+
+    # running totals of the opening and of the closing transactions
+    opens = actions == trans_type
+    trans_type_total = np.cumsum(trans_sizes * opens, axis=1)
+    kill_total = np.cumsum(trans_sizes * ~opens, axis=1)
+
+    # a chain ends at the first transaction that closes the position. If it
+    # would close more than is open, it is cut down to close exactly.
+    closed = kill_total >= trans_type_total
+    closed[:, 0] = False
+    ends = np.where(
+        closed.any(axis=1), closed.argmax(axis=1), no_investments - 1
+    )
+    rows = np.arange(no_chains)
+    trans_sizes[rows, ends] -= np.maximum(
+        kill_total[rows, ends] - trans_type_total[rows, ends], 0
+    )
+
+    keep = np.arange(no_investments)[None, :] <= ends[:, None]
+    chain = np.repeat(rows, keep.sum(axis=1))
+
+    return chain, dates[date_ids][keep], actions[keep], trans_sizes[keep]
+
+
+def portfolio_replay(
+    user_id,
+    ticker,
+    position_type,
+    action,
+    no_shares,
+    at_price
+    ):
+    """
+    This function computes the portfolio table from the transaction history
+    in one pass, giving the same rows that the trigger in 
+    '_sql/trigger.sql' produces when the transactions are inserted one at a
+    time. This allows transaction_history to be bulk loaded without the
+    trigger and on servers other than MySQL. 
+
+    The transactions of each (user_id, ticker, position_type) position are
+    replayed in the order they are given. The replay is vectorized over the
+    positions, so there is one numpy step per transaction of the longest
+    position rather than one per transaction. As in the trigger, the SET 
+    assignments are applied from left to right, so later assignments see the
+    updated values of earlier ones. A gain that divides by zero is NaN, which
+    MySQL stores as NULL.
+
+    Parameters
+    --------------------------------------------------
+    user_id : np.array of int
+
+    ticker : np.array of str
+
+    position_type : np.array of int
+        1 for a long and -1 for a short.
+
+    action : np.array of int
+        1 for a buy and -1 for a sell.
+
+    no_shares : np.array of float
+
+    at_price : np.array of float
+
+    Returns
+    --------------------------------------------------
+    portfolio : dict
+        The columns of the portfolio table, one row per position ordered by 
+        the first transaction of the position.
+    """
+    user_id = np.asarray(user_id)
+    ticker = np.asarray(ticker)
+    position_type = np.asarray(position_type)
+    action = np.asarray(action)
+    no_shares = np.asarray(no_shares, dtype=float)
+    at_price = np.asarray(at_price, dtype=float)
+
+    # the positions numbered by their first transaction, and the step of 
+    # each transaction within its position
+    keys = pd.MultiIndex.from_arrays([user_id, ticker, position_type])
+    group, uniques = pd.factorize(keys)
+    order = np.argsort(group, kind='stable')
+    counts = np.bincount(group)
+    step = np.empty(len(group), dtype=int)
+    step[order] = np.arange(len(group)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+
+    no_groups = len(counts)
+    exists = np.zeros(no_groups, dtype=bool)
+    position = np.zeros(no_groups)
+    last_price = np.zeros(no_groups)
+    cost_basis = np.zeros(no_groups)
+    total_invested = np.zeros(no_groups)
+    current_value = np.zeros(no_groups)
+    realized_profit = np.zeros(no_groups)
+    gain = np.zeros(no_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k in range(counts.max(initial=0)):
+            rows = np.where(step == k)[0]
+            g = group[rows]
+            n = no_shares[rows]
+            p = at_price[rows]
+            long = position_type[rows] > 0
+            buy = action[rows] > 0
+
+            # the first opening transaction inserts the row
+            opens = np.where(long, buy, ~buy)
+            new = opens & ~exists[g]
+            if new.any():
+                gn, nn, pn = g[new], n[new], p[new]
+                sign = np.where(long[new], 1.0, -1.0)
+                position[gn] = sign * nn
+                last_price[gn] = pn
+                cost_basis[gn] = pn
+                total_invested[gn] = np.where(long[new], pn * nn, 0)
+                current_value[gn] = sign * pn * nn
+                realized_profit[gn] = np.where(long[new], 0, pn * nn)
+                gain[gn] = 0
+                exists[gn] = True
+
+            # the other transactions update the row, if there is one
+            upd = ~new & exists[g]
+            g, n, p = g[upd], n[upd], p[upd]
+            long, buy = long[upd], buy[upd]
+
+            position[g] += np.where(buy, n, -n)
+            last_price[g] = p
+            cost_basis[g] = np.select(
+                [long & buy, ~long & ~buy],
+                [
+                    ((position[g] - n) * cost_basis[g] + n * last_price[g])
+                    / position[g],
+                    (-1.0 * (position[g] + n) * cost_basis[g] + n * p)
+                    / position[g] * -1.0,
+                ],
+                cost_basis[g]
+            )
+            total_invested[g] = np.where(
+                long, total_invested[g] + np.where(buy, n * p, 0), 0
+            )
+            current_value[g] = position[g] * p
+            realized_profit[g] += np.where(
+                long, np.where(buy, 0, n * p), np.where(buy, -n * p, n * p)
+            )
+            gain[g] = np.where(
+                long,
+                100.0 * (
+                    current_value[g] + realized_profit[g] - total_invested[g]
+                ) / total_invested[g],
+                100.0 * (realized_profit[g] + current_value[g]) 
+                / realized_profit[g]
+            )
+
+    gain[~np.isfinite(gain)] = np.nan
+
+    return {
+        'user_id': uniques.get_level_values(0).values[exists],
+        'ticker': uniques.get_level_values(1).values[exists],
+        'position_type': uniques.get_level_values(2).values[exists],
+        'position': position[exists],
+        'last_price': last_price[exists],
+        'cost_basis': cost_basis[exists],
+        'total_invested': total_invested[exists],
+        'current_value': current_value[exists],
+        'realized_profit': realized_profit[exists],
+        'gain': gain[exists],
+    }
+
+
 def longest_chain_of_nans(engine, ticker, ohlcv='open', table='ohlcv'):
     """
     During pre and post market when liquidity is low, if there is a period 
@@ -185,15 +440,195 @@ def longest_chain_of_nans(engine, ticker, ohlcv='open', table='ohlcv'):
 
     """
 
-    query = f"select {ohlcv} from {table} where ticker = '{ticker}'"
-    df = pd.read_sql(query, engine)
-    inds = np.isnan(df.values)
-    df.iloc[inds] = np.repeat(999999, len(df.iloc[np.isnan(df.values)]))
-    nan_in_a_row = df.values.reshape(-1)
+    source = db.table(
+        table, db.column('ticker'), db.column('datetime'), db.column(ohlcv)
+    )
+    query = db.select(source.c[ohlcv]).where(
+        source.c.ticker == ticker
+    ).order_by(source.c.datetime)
+    with engine.connect() as conn:
+        values = np.array(
+            conn.execute(query).scalars().all(), dtype=float
+        )
+
     nan_in_a_row = np.where(
-        np.diff(np.hstack(([False], nan_in_a_row==999999, [False])))
+        np.diff(np.hstack(([False], np.isnan(values), [False])))
     )[0].reshape((-1, 2))
     nan_loc = nan_in_a_row[np.argmax(np.diff(nan_in_a_row, axis=1))]
 
     return nan_loc
 
+
+def nan_runs(engine,
+             tickers=None,
+             columns=['open', 'high', 'low', 'close', 'volume'],
+             table='ohlcv',
+             chunk_size=100000):
+    """
+    This function finds every chain of NaNs for every ticker and column of 
+    the ohlcv table in a single query. The rows are streamed from the
+    database ordered by ticker and datetime and scanned chunk_size rows at a
+    time with numpy, carrying any chain that is still open at the end of a
+    chunk over to the next one. The memory used is therefore bounded by
+    chunk_size rather than by the size of the table.
+
+    Parameters
+    --------------------------------------------------
+    engine : sqlalchemy engine
+
+    tickers : list of str, Default None
+        The tickers to scan. None scans all of them.
+
+    columns : list of str, Default ['open', 'high', 'low', 'close', 'volume']
+
+    table : str, Default 'ohlcv'
+        The name of the table.
+
+    chunk_size : int, Default 100000
+        The number of rows scanned at a time.
+
+    Returns
+    --------------------------------------------------
+    runs : pd.DataFrame
+        One row per chain of NaNs with the columns ticker, column, start, end
+        and length. start and end are the datetimes of the first and last NaN
+        of the chain and length is the number of rows in it.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    engine = db.create_engine("...")
+
+    runs = nan_runs(engine)
+
+    # the longest chain of NaNs of each ticker and column
+    runs.loc[runs.groupby(['ticker', 'column'])['length'].idxmax()]
+    """
+    # the datetime is typed so that drivers without a native datetime, like
+    # sqlite, still return datetimes rather than strings
+    source = db.table(
+        table,
+        db.column('ticker'),
+        db.column('datetime', db.DateTime),
+        *[db.column(col) for col in columns]
+    )
+    query = db.select(
+        source.c.ticker, source.c.datetime, *[source.c[c] for c in columns]
+    ).order_by(source.c.ticker, source.c.datetime)
+    if tickers is not None:
+        query = query.where(source.c.ticker.in_(tickers))
+
+    runs = {k: [] for k in ['ticker', 'column', 'start', 'end', 'length']}
+    # the chain of each column that is still open at the end of a chunk, as 
+    # (ticker, start, length, end)
+    carry = [None] * len(columns)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(chunk_size):
+            ticker = np.array([r[0] for r in rows])
+            datetime = np.array([r[1] for r in rows])
+            values = np.array(
+                [r[2:] for r in rows], dtype=float
+            ).reshape((len(rows), len(columns)))
+
+            new_ticker = np.hstack(([True], ticker[1:] != ticker[:-1]))
+            for j, col in enumerate(columns):
+                is_nan = np.isnan(values[:, j])
+                continues = np.hstack(([False], ~new_ticker[1:]))
+                before = np.hstack(([False], is_nan[:-1])) & continues
+                after = np.hstack((is_nan[1:] & ~new_ticker[1:], [False]))
+                starts = np.where(is_nan & ~before)[0]
+                ends = np.where(is_nan & ~after)[0]
+
+                # the chain that was still open at the end of the last chunk
+                if carry[j] is not None:
+                    if is_nan[0] and carry[j][0] == ticker[0]:
+                        _, start, length, _ = carry[j]
+                        starts = starts[1:]
+                        if ends[0] == len(rows) - 1:
+                            # the chain spans the whole chunk
+                            carry[j] = (
+                                ticker[0], start, length + len(rows),
+                                datetime[-1]
+                            )
+                            continue
+                        carry[j] = (
+                            ticker[0], start, length + ends[0] + 1,
+                            datetime[ends[0]]
+                        )
+                        ends = ends[1:]
+                    for k, v in zip(['ticker', 'start', 'length', 'end'],
+                                    carry[j]):
+                        runs[k].append(v)
+                    runs['column'].append(col)
+                    carry[j] = None
+
+                # the last chain of the chunk may go on in the next chunk
+                if len(ends) > 0 and ends[-1] == len(rows) - 1:
+                    carry[j] = (
+                        ticker[-1], 
+                        datetime[starts[-1]], 
+                        len(rows) - starts[-1],
+                        datetime[-1]
+                    )
+                    starts, ends = starts[:-1], ends[:-1]
+
+                runs['ticker'].extend(ticker[starts])
+                runs['column'].extend([col] * len(starts))
+                runs['start'].extend(datetime[starts])
+                runs['end'].extend(datetime[ends])
+                runs['length'].extend(ends - starts + 1)
+
+    for j, col in enumerate(columns):
+        if carry[j] is not None:
+            for k, v in zip(['ticker', 'start', 'length', 'end'], carry[j]):
+                runs[k].append(v)
+            runs['column'].append(col)
+
+    return pd.DataFrame(runs).sort_values(
+        ['ticker', 'column', 'start'], ignore_index=True
+    )
+
+
+def nan_gaps(dates, make_nans, max_nans_in_a_row, 
+             columns=['open', 'high', 'low', 'close', 'volume']):
+    """
+    This function picks the datetimes that are set to NaN in each of the
+    ohlcv columns. For each column, make_nans many dates are randomly
+    selected and each one starts a gap of 1 to max_nans_in_a_row - 1 
+    consecutive minutes. The gaps are drawn all at once rather than one
+    date at a time.
+
+    Parameters
+    --------------------------------------------------
+    dates : np.array of datetime64
+        The dates that a gap may start at.
+
+    make_nans : int
+        The number of gaps per column.
+
+    max_nans_in_a_row : int
+        One more than the longest possible gap.
+
+    columns : list of str, Default ['open', 'high', 'low', 'close', 'volume']
+
+    Returns
+    --------------------------------------------------
+    gaps : dict
+        Maps each column to the unique datetimes that should be set to NaN.
+    """
+    gaps = {}
+    for col in columns:
+        rm_dates = np.random.choice(dates, make_nans)
+        in_a_row = np.random.randint(1, max_nans_in_a_row, size=make_nans)
+        # the minute of each datetime within its gap
+        minute = np.arange(in_a_row.sum()) - np.repeat(
+            np.cumsum(in_a_row) - in_a_row, in_a_row
+        )
+        gaps[col] = np.unique(
+            np.repeat(rm_dates, in_a_row) 
+            + (60 * minute).astype('timedelta64[s]')
+        )
+    return gaps
@@ -15,7 +15,15 @@ def create(engine,
            trigger_path: str | None = None,
            make_nans: int = 20,
            max_nans_in_a_row: int = 5,
-           drop_db_if_exists: bool = True):
+           drop_db_if_exists: bool = True,
+           price_source=None,
+           prefetch: int = 2,
+           build_portfolio: bool = False,
+           cache_dir: str | None = None,
+           offline: bool = False,
+           defer_indexes: bool = False,
+           sink=None,
+           listener=None):
 
     investor_returns = InvestorReutrns(engine)
     return investor_returns.initialize(no_investors=no_investors,
@@ -27,5 +35,36 @@ def create(engine,
                                        trigger_path=trigger_path,
                                        make_nans=make_nans,
                                        max_nans_in_a_row=max_nans_in_a_row,
-                                       drop_db_if_exists=drop_db_if_exists)
+                                       drop_db_if_exists=drop_db_if_exists,
+                                       price_source=price_source,
+                                       prefetch=prefetch,
+                                       build_portfolio=build_portfolio,
+                                       cache_dir=cache_dir,
+                                       offline=offline,
+                                       defer_indexes=defer_indexes,
+                                       sink=sink,
+                                       listener=listener)
 
+
+
+def refresh(engine,
+            tickers: list[str] | None = None,
+            end: dt.datetime | None = None,
+            time_step: str = '1m',
+            start: dt.datetime | None = None,
+            price_source=None,
+            prefetch: int = 2,
+            cache_dir: str | None = None,
+            offline: bool = False,
+            listener=None):
+
+    investor_returns = InvestorReutrns(engine)
+    return investor_returns.refresh(tickers=tickers,
+                                    end=end,
+                                    time_step=time_step,
+                                    start=start,
+                                    price_source=price_source,
+                                    prefetch=prefetch,
+                                    cache_dir=cache_dir,
+                                    offline=offline,
+                                    listener=listener)
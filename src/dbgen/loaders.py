@@ -0,0 +1,346 @@
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import sqlalchemy as db
+
+from .utils import bulk_insert
+
+
+def load(conn, table, columns, chunk_size=100000):
+    """
+    This function loads column batches into a table with the fastest path
+    that the database of the connection offers.
+
+    - mysql with pymysql : LOAD DATA LOCAL INFILE from a temporary csv. The
+      engine needs connect_args={'local_infile': True}, otherwise the rows
+      are inserted with executemany.
+    - postgresql with psycopg2 : COPY FROM STDIN from an in memory csv.
+    - anything else, ie sqlite : executemany, see bulk_insert. On sqlite
+      the load is faster inside of unjournaled.
+
+    In every case the rows are loaded in the transaction of conn, so they
+    are committed or rolled back with the rest of it. NaN and None are
+    loaded as NULL.
+
+    Parameters
+    --------------------------------------------------
+    conn : sqlalchemy connection
+        An open connection. The caller is responsible for committing.
+
+    table : sqlalchemy.Table
+
+    columns : dict
+        A dictionary mapping column names to equal length sequences of values.
+        The sequences may be lists or numpy arrays.
+
+    chunk_size : int, Default 100000
+        The number of rows per csv file, COPY or executemany call.
+
+    Returns
+    --------------------------------------------------
+    int
+        The number of loaded rows.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    engine = db.create_engine(
+        "mysql+pymysql://...", connect_args={'local_infile': True}
+    )
+
+    with engine.begin() as conn:
+        load(
+            conn,
+            _Mailing.__table__,
+            {'first_name': ['Megan', 'Bryan'], 'last_name': ['Chang', 'Sellers']}
+        )
+    """
+    names = list(columns.keys())
+    if len(names) == 0:
+        return 0
+
+    dialect = conn.dialect
+    if dialect.name == 'mysql' and dialect.driver == 'pymysql':
+        if getattr(conn.connection.dbapi_connection, '_local_infile', False):
+            return _load_data_infile(conn, table, columns, chunk_size)
+    elif dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+        return _copy_from_stdin(conn, table, columns, chunk_size)
+
+    return bulk_insert(conn, table, _nan_to_none(columns), chunk_size)
+
+
+@contextmanager
+def unjournaled(conn):
+    """
+    Turns the journal and the syncs to disk of a sqlite connection off for
+    the block and restores them after it, since they would stay on for the
+    pooled connection otherwise. This trades the durability of the database
+    file in a crash for speed. A transaction that fails in the block can not
+    be rolled back either, and the rows that were already written stay in
+    the file, so do not use it where a crash has to leave only whole
+    transactions behind. The pragmas can only be changed outside of a
+    transaction, so conn must not be in one when the block starts and any
+    transaction that is still open when it ends is rolled back. On other
+    databases it does nothing.
+
+    Parameters
+    --------------------------------------------------
+    conn : sqlalchemy connection
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    engine = db.create_engine("sqlite:///...")
+
+    with engine.connect() as conn:
+        with unjournaled(conn):
+            with conn.begin():
+                load(conn, _Mailing.__table__, columns)
+    """
+    if conn.dialect.name != 'sqlite':
+        yield
+        return
+
+    journal_mode = conn.exec_driver_sql('PRAGMA journal_mode').scalar()
+    synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+    conn.exec_driver_sql('PRAGMA journal_mode = OFF')
+    conn.exec_driver_sql('PRAGMA synchronous = OFF')
+    conn.commit()
+    try:
+        yield
+    finally:
+        if conn.in_transaction():
+            conn.rollback()
+        conn.exec_driver_sql(f'PRAGMA journal_mode = {journal_mode}')
+        conn.exec_driver_sql(f'PRAGMA synchronous = {synchronous}')
+        conn.commit()
+
+
+def upsert(conn, table, columns, chunk_size=10000):
+    """
+    This function inserts column batches into a table and updates the rows
+    whose primary key is already in the table instead of failing on them.
+    The rows are sent with executemany in chunks of chunk_size rows, with
+    the upsert of the database of the connection,
+
+    - mysql : INSERT ... ON DUPLICATE KEY UPDATE
+    - postgresql and sqlite : INSERT ... ON CONFLICT (primary key) DO UPDATE
+
+    Other databases raise a ValueError. NaN and None are written as NULL.
+
+    Parameters
+    --------------------------------------------------
+    conn : sqlalchemy connection
+        An open connection. The caller is responsible for committing.
+
+    table : sqlalchemy.Table
+        A table with a primary key.
+
+    columns : dict
+        A dictionary mapping column names to equal length sequences of values.
+        The columns must include the primary key.
+
+    chunk_size : int, Default 10000
+        The number of rows per executemany call.
+
+    Returns
+    --------------------------------------------------
+    int
+        The number of inserted or updated rows.
+
+    Example Usage
+    --------------------------------------------------
+    import datetime as dt
+    import sqlalchemy as db
+
+    engine = db.create_engine("...")
+
+    with engine.begin() as conn:
+        upsert(
+            conn,
+            OHLCV.__table__,
+            {
+                'datetime': [dt.datetime(2024, 1, 2, 9, 30)],
+                'ticker': ['SPY'],
+                'close': [472.65]
+            }
+        )
+    """
+    names = list(columns.keys())
+    if len(names) == 0:
+        return 0
+
+    keys = [col.name for col in table.primary_key.columns]
+    updates = [name for name in names if name not in keys]
+
+    dialect = conn.dialect.name
+    check_upsert(dialect)
+    if dialect in ['mysql', 'mariadb']:
+        from sqlalchemy.dialects.mysql import insert
+
+        statement = insert(table)
+        # a row that only has the key updates its key to itself
+        statement = statement.on_duplicate_key_update({
+            name: statement.inserted[name] for name in updates or keys[:1]
+        })
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        statement = insert(table)
+        if updates:
+            statement = statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={name: statement.excluded[name] for name in updates}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+
+    return bulk_insert(
+        conn, table, _nan_to_none(columns), chunk_size, statement=statement
+    )
+
+
+UPSERT_DIALECTS = ['mysql', 'mariadb', 'postgresql', 'sqlite']
+
+
+def check_upsert(dialect):
+    """
+    Raises a ValueError if upsert does not support the dialect, given by its
+    name, ie engine.dialect.name.
+    """
+    if dialect not in UPSERT_DIALECTS:
+        raise ValueError(
+            f"upsert does not support {dialect}, only "
+            f"{', '.join(UPSERT_DIALECTS)}."
+        )
+
+
+def _load_data_infile(conn, table, columns, chunk_size):
+    names = list(columns.keys())
+    preparer = conn.dialect.identifier_preparer
+    statement = (
+        "LOAD DATA LOCAL INFILE %s INTO TABLE "
+        f"{preparer.format_table(table)} "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+        "ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+        f"({', '.join(preparer.quote(name) for name in names)})"
+    )
+
+    no_rows = 0
+    cursor = conn.connection.dbapi_connection.cursor()
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        for frame in _frames(table, columns, chunk_size):
+            for name in frame.columns:
+                # mysql reads booleans as integers and a backslash as the
+                # start of an escape sequence
+                if frame[name].dtype == bool:
+                    frame[name] = frame[name].astype(int)
+                elif frame[name].dtype == object:
+                    frame[name] = frame[name].map(
+                        lambda x: x.replace('\\', '\\\\')
+                        if isinstance(x, str) else x
+                    )
+            frame.to_csv(
+                path, header=False, index=False, na_rep='\\N',
+                lineterminator='\n', encoding='utf-8'
+            )
+            no_rows += cursor.execute(statement, (path,))
+    finally:
+        cursor.close()
+        os.remove(path)
+
+    return no_rows
+
+
+def _copy_from_stdin(conn, table, columns, chunk_size):
+    names = list(columns.keys())
+    preparer = conn.dialect.identifier_preparer
+    statement = (
+        f"COPY {preparer.format_table(table)} "
+        f"({', '.join(preparer.quote(name) for name in names)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    )
+
+    no_rows = 0
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        for frame in _frames(table, columns, chunk_size):
+            buffer = io.StringIO()
+            frame.to_csv(
+                buffer, header=False, index=False, na_rep='\\N',
+                lineterminator='\n'
+            )
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+            no_rows += len(frame)
+    finally:
+        cursor.close()
+
+    return no_rows
+
+
+def _frames(table, columns, chunk_size):
+    """
+    Yields the columns as data frames of chunk_size rows.
+    """
+    # pandas is only needed by the csv based loaders, so it is not imported
+    # by the executemany path
+    import pandas as pd
+
+    no_rows = len(next(iter(columns.values())))
+    for start in range(0, no_rows, chunk_size):
+        yield pd.DataFrame({
+            name: _column_values(table, name, values[start: start + chunk_size])
+            for name, values in columns.items()
+        })
+
+
+def _column_values(table, name, values):
+    """
+    Floats that go into integer columns are rounded, which is what the
+    databases do when they are inserted with executemany, since a csv with a
+    decimal point in an integer column is rejected.
+    """
+    values = np.asarray(values)
+    if (
+        values.dtype.kind == 'f' 
+        and isinstance(table.c[name].type, db.Integer)
+    ):
+        # half way cases are rounded away from zero, like the casts of the
+        # databases
+        nans = np.isnan(values)
+        values = np.where(nans, 0, values)
+        values = (
+            np.sign(values) * np.floor(np.abs(values) + 0.5)
+        ).astype(np.int64)
+        if nans.any():
+            values = values.astype(object)
+            values[nans] = None
+    return values
+
+
+def _nan_to_none(columns):
+    """
+    Replaces NaN by None in the float columns, which the drivers bind as
+    NULL.
+    """
+    converted = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if values.dtype.kind == 'f':
+            nans = np.isnan(values)
+            if nans.any():
+                values = values.astype(object)
+                values[nans] = None
+        converted[name] = values
+    return converted
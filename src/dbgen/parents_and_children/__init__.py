@@ -1 +1,19 @@
-from .create import create
+import importlib
+
+# create pulls in sqlalchemy and numpy, so it is only imported when it is
+# first used
+_lazy = {'create': '.create'}
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    # the import bound the submodule to the name, which is replaced by the
+    # function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy))
@@ -1,25 +1,32 @@
 import sqlalchemy as db
 import numpy as np
-import faker
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from sqlalchemy.orm import declarative_base as Base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils import create_database, database_exists, drop_database
 
+from ..instrumentation import Phases
+from ..sinks import DatabaseSink
+from ..utils import create_indexes, create_tables
 from ._constants import JOBS, SALARY_AVG
-from ._utils import sal_sav_start_gen
+from ._utils import (
+    IdentityPool,
+    family_sizes,
+    sal_sav_start_gen_batch,
+    unique_parent_pairs
+)
 
 
 class ParentsAndChildren:
     def __init__(
         self,
         engine,
+        locale=None,
     ):
         self.engine = engine
         self.base = Base()
-
-        self._fk = faker.Faker()
+        self.locale = locale
 
         self.Mailing = Mailing(self.base)
         self.Employment = Employment(self.base)
@@ -32,6 +39,10 @@ class ParentsAndChildren:
     engine : sqlalchemy engine
         The engine connecting sqlalchemy to the database.
 
+    locale : str or list of str, Default None
+        The faker.Faker locale used for the names and addresses. None uses the
+        faker default of 'en_US'.
+
     Methods
     --------------------------------------------------
     initialize
@@ -74,6 +85,15 @@ class ParentsAndChildren:
     """
 
 
+    @property
+    def _fk(self):
+        # the faker is only built when the identity pool needs it, which
+        # worker processes never do
+        locale = self.locale
+        if isinstance(locale, list):
+            locale = tuple(locale)
+        return _faker(locale)
+
     def initialize(
             self,
         no_jobs=15,
@@ -82,6 +102,15 @@ class ParentsAndChildren:
         faker_seed=0,
         numpy_seed=0,
         drop_db_if_exists=True,
+        chunk_size=None,
+        identity_pool_size=10000,
+        resume=False,
+        workers=1,
+        connect_args=None,
+        defer_indexes=False,
+        sink=None,
+        listener=None,
+        generation=0,
     ):
         """
         This function will initialize the database, create the tables and then
@@ -109,6 +138,79 @@ class ParentsAndChildren:
         numpy_seed : int, Default 0
             The numpy.random seed to allow for reproducability
 
+        chunk_size : int, Default None
+            If given, the parents and children are generated, written and
+            committed chunk_size many at a time and then discarded, which
+            keeps the memory flat regardless of no_parents and no_children.
+            Each chunk is seeded on its own, so the data only depends on the
+            seeds and chunk_size. If None, everything is written in a single
+            chunk. Rows are inserted with SQLAlchemy Core rather than through
+            ORM objects and a session.
+
+        identity_pool_size : int, Default 10000
+            The names, addresses and bank accounts are sampled from a pool of
+            this many pre-generated Faker values per field. A smaller pool is
+            faster to build but repeats values more often. The pool is never
+            larger than max(no_parents, no_children).
+
+        resume : boolean, Default False
+            If true, the database is not dropped and generation picks up 
+            after the last chunk that was committed by a previous run. The
+            previous run must have used the same parameters. Unless resume
+            is True, a sqlite database is written without a journal, which
+            is faster but can leave half of a chunk behind in a crash, so a
+            build that may have to be resumed should be started with resume
+            as well.
+
+        workers : int, Default 1
+            The number of processes used to generate and write the data. The
+            parent and child ids are split into workers many shards of
+            chunks that are written concurrently, each over its own
+            connection. Since every chunk is seeded from the seeds and its
+            chunk number, the data does not depend on the order in which the
+            shards finish. If chunk_size is None, each shard is a single
+            chunk. The engine is recreated in each process from its url and
+            connect_args. An in-memory sqlite database can not be shared
+            between processes, so it needs a single worker.
+
+        connect_args : dict, Default None
+            The connect_args that the engine was created with, ie
+            {'local_infile': True} so that the worker processes load with
+            LOAD DATA on mysql. Only needed with more than one worker.
+
+        defer_indexes : boolean, Default False
+            If true, the tables are created without their secondary indexes,
+            ie children(parent1_id) and children(parent2_id), and the indexes
+            are built in one pass after all of the rows are loaded. The
+            primary keys are always created with the tables, since the rows
+            arrive in the order of their keys and resume and generation look
+            the loaded ids up by them.
+
+        sink : dbgen.sinks.CsvSink or dbgen.sinks.ParquetSink, Default None
+            If given, no database is used at all. Every chunk of every table
+            is written to its own file by the sink instead, ie
+            <directory>/mailing/part-00000.csv. With resume, the chunks that
+            the sink already holds are skipped.
+
+        listener : callable, Default None
+            Called with a dictionary for the start and end of every phase of
+            the build, ie the schema, and the generate, insert and commit of
+            each chunk, with their rows, bytes and peak memory, see
+            dbgen.instrumentation.Phases. dbgen.instrumentation.TimingReport
+            collects them into a json report.
+
+        generation : int, Default 0
+            If 0, the database is built from scratch. Above 0, the database
+            is grown instead. It is not dropped and no_parents more parents
+            and no_children more children are added after the largest
+            parent_id and child_id that are already in it. Every new family
+            has at least one new parent, and the other parent may be new or
+            old, so the new families never repeat the parent pair of an
+            existing family. The new rows only depend on the seeds, the
+            generation and the size of the database that is grown. Use a new
+            generation number each time the same database is grown. Can not
+            be combined with resume or a sink.
+
         returns:
             The function will create a database with name specified in the 
             engine which is inputed by the user. It will populate the database
@@ -120,10 +222,34 @@ class ParentsAndChildren:
             savings and start date for the job is generated using 
             the SalSavStartGen class, which generates believable salaries 
             given the average salary of the job that the person has.
+            The time in seconds spent creating the tables, loading the rows
+            and building the indexes is returned as a dictionary.
         """
 
-        np.random.seed(numpy_seed) 
-        faker.Faker.seed(faker_seed)
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}.")
+        if workers > 1 and sink is None and _in_memory(self.engine):
+            raise ValueError(
+                "An in-memory sqlite database can not be shared between "
+                "worker processes, use workers=1 or a database file."
+            )
+
+        if generation > 0:
+            if resume or sink is not None:
+                raise ValueError(
+                    "generation can not be combined with resume or a sink."
+                )
+            if no_children > 0 and no_parents == 0:
+                raise ValueError(
+                    "Growing the children needs new parents, since every new "
+                    "family has at least one new parent."
+                )
+
+        phases = Phases(listener)
+
+        from faker import Faker
+
+        Faker.seed(faker_seed)
 
         jobs = JOBS[: min(no_jobs, len(JOBS))]
         salary_avg = {j: SALARY_AVG[j] for j in jobs}
@@ -131,93 +257,364 @@ class ParentsAndChildren:
         jobs.append('unemployed')
         salary_avg['unemployed'] = 0
         
-        if drop_db_if_exists:
-            if database_exists(self.engine.url):
-                drop_database(self.engine.url) 
-
-        if not database_exists(self.engine.url):
-            create_database(self.engine.url) 
-
-        self.base.metadata.create_all(bind=self.engine)
-
-        session  = sessionmaker(bind=self.engine)()
-        for _ in range(no_parents):
-            mailing = self.Mailing(
-                self._fk.first_name(),
-                self._fk.last_name(),
-                self._fk.street_address(),
-                self._fk.city(),
-                self._fk.state(),
-                self._fk.zipcode(),
-            )
-            session.add(mailing)
+        database = sink is None
+        with phases.phase('create_tables'):
+            if database:
+                # sqlalchemy_utils is slow to import and only needed with a
+                # database
+                from sqlalchemy_utils import (
+                    create_database, database_exists, drop_database
+                )
 
-            job = np.random.choice(jobs)
-            salary, startdate, savings = sal_sav_start_gen(
-                salary_avg[job], self._fk
-            )
+                # with resume the sqlite journal is kept, so that a crash in
+                # a chunk leaves only whole chunks behind
+                sink = DatabaseSink(
+                    self.engine, durable=resume, connect_args=connect_args
+                )
+
+                if drop_db_if_exists and not resume and generation == 0:
+                    if database_exists(self.engine.url):
+                        drop_database(self.engine.url) 
+
+                if not database_exists(self.engine.url):
+                    create_database(self.engine.url) 
+
+                create_tables(
+                    self.engine, self.base.metadata, indexes=not defer_indexes
+                )
 
-            employment = self.Employment(
-                salary,
-                job,
-                startdate,
+        with phases.phase('load'):
+            if chunk_size is None:
+                chunk_size = -(-max(no_parents, no_children, 1) // workers)
+            no_chunks = -(-max(no_parents, no_children) // chunk_size)
+
+            chunk_nos = list(range(no_chunks))
+            if resume:
+                if database:
+                    committed = self._committed_chunks(chunk_size)
+                else:
+                    committed = sink.parts()
+                chunk_nos = [c for c in chunk_nos if c not in committed]
+
+            # the ids of a generation start after the ids already in the
+            # database
+            parent_offset, child_offset = 0, 0
+            if generation > 0:
+                parent_offset, child_offset = self._max_ids()
+
+            with phases.phase('identity_pool'):
+                pool = IdentityPool(
+                    self._fk,
+                    min(identity_pool_size, max(no_parents, no_children, 1))
+                )
+
+            # the family ids are numbered densely across the chunks, so the
+            # families of every chunk are counted up front
+            with phases.phase('families'):
+                no_families = [
+                    len(_chunk_families(
+                        numpy_seed, chunk_no, chunk_size, no_children,
+                        generation
+                    ))
+                    for chunk_no in range(no_chunks)
+                ]
+                first_families = np.cumsum([0] + no_families).tolist()
+
+            chunk_kwargs = {
+                'chunk_size': chunk_size,
+                'no_parents': no_parents,
+                'no_children': no_children,
+                'jobs': jobs,
+                'salary_avg': salary_avg,
+                'pool': pool,
+                'faker_seed': faker_seed,
+                'numpy_seed': numpy_seed,
+                'sink': sink,
+                'generation': generation,
+                'parent_offset': parent_offset,
+                'child_offset': child_offset,
+                'first_families': first_families,
+            }
+
+            if workers == 1:
+                for chunk_no in chunk_nos:
+                    self._write_chunk(chunk_no, phases, **chunk_kwargs)
+            else:
+                # each shard is a contiguous range of chunks, i.e. of parent
+                # ids, written by its own process over its own connection
+                shards = np.array_split(
+                    np.array(chunk_nos, dtype=int), workers
+                )
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(
+                            _write_shard, shard.tolist(), chunk_kwargs
+                        )
+                        for shard in shards if len(shard) > 0
+                    ]
+                    # the events of the workers are passed on to the listener
+                    for future in futures:
+                        for event in future.result():
+                            phases.emit(event)
+
+        if database:
+            with phases.phase('create_indexes'):
+                create_indexes(self.engine, self.base.metadata)
+
+        phases.finish()
+        return phases.timings
+
+    def _write_chunk(
+        self,
+        chunk_no,
+        phases,
+        chunk_size,
+        no_parents,
+        no_children,
+        jobs,
+        salary_avg,
+        pool,
+        faker_seed,
+        numpy_seed,
+        sink,
+        generation=0,
+        parent_offset=0,
+        child_offset=0,
+        first_families=None,
+    ):
+        """
+        Generates, writes and commits the parents with ids parent_offset +
+        chunk_no * chunk_size + 1, ..., parent_offset + (chunk_no + 1) *
+        chunk_size and the children with the same ids after child_offset.
+        first_families[chunk_no] is the number of families of the generation
+        before the chunk.
+        """
+        rng = _chunk_rng(numpy_seed, chunk_no, generation)
+        pool_rng = _chunk_rng(faker_seed, chunk_no, generation)
+
+        # generation 0 keeps the seed of a database that was never grown
+        pair_seed = np.random.SeedSequence(
+            numpy_seed, spawn_key=(generation,) if generation > 0 else ()
+        )
+
+        first_id = chunk_no * chunk_size + 1
+        with phases.phase('generate', part=chunk_no) as counts:
+            parents = self._generate_parents(
+                parent_offset + first_id,
+                parent_offset + min(first_id + chunk_size, no_parents + 1),
+                jobs,
+                salary_avg,
+                pool,
+                rng,
+                pool_rng,
+            )
+            children = self._generate_children(
+                child_offset + first_id,
+                _chunk_families(
+                    numpy_seed, chunk_no, chunk_size, no_children, generation
+                ),
+                first_families[chunk_no],
+                parent_offset + no_parents,
+                parent_offset,
+                pair_seed,
+                pool,
+                rng,
+                pool_rng,
+            )
+            counts['rows'] = sum(
+                len(next(iter(columns.values())))
+                for columns in {**parents, **children}.values()
             )
-            session.add(employment)
 
-            finances = self.Finances(
-                self._fk.bban(),
-                savings,
+        # each chunk is written and committed on its own so that memory
+        # stays flat and a crash only loses the chunk in flight
+        sink.write({**parents, **children}, chunk_no, phases)
+
+    def _generate_parents(
+        self, first_id, last_id, jobs, salary_avg, pool, rng, pool_rng
+    ):
+        """
+        Generates the mailing, employment and finances rows for the parents
+        with ids first_id, ..., last_id - 1.
+        """
+        no_parents = max(last_id - first_id, 0)
+        parent_ids = np.arange(first_id, first_id + no_parents)
+
+        mailing = {'parent_id': parent_ids, **pool.mailing(no_parents, pool_rng)}
+
+        job_ids = rng.integers(0, len(jobs), size=no_parents)
+        salary, startdate, savings = sal_sav_start_gen_batch(
+            np.array([salary_avg[j] for j in jobs])[job_ids], rng
+        )
+
+        employment = {
+            'parent_id': parent_ids,
+            'salary': salary,
+            'job': np.array(jobs)[job_ids],
+            'start_date': startdate,
+        }
+        finances = {
+            'parent_id': parent_ids,
+            'bank_act': pool.bank_accounts(no_parents, pool_rng),
+            'savings': savings,
+        }
+
+        return {
+            self.Mailing.__table__: mailing,
+            self.Employment.__table__: employment,
+            self.Finances.__table__: finances,
+        }
+
+    def _generate_children(
+        self,
+        first_id,
+        sizes,
+        first_family,
+        no_parents,
+        no_old_parents,
+        pair_seed,
+        pool,
+        rng,
+        pool_rng,
+    ):
+        """
+        Generates the children rows with ids first_id, first_id + 1, ... of
+        families of the given sizes. The family ids of the chunk start at
+        first_family, the number of families of the generation before the
+        chunk, so the family ids of a generation are dense and the parent
+        pairs of different chunks are unique. Every family has a parent above
+        no_old_parents.
+        """
+        no_children = int(sizes.sum())
+
+        parent1_id, parent2_id = unique_parent_pairs(
+            first_family + np.arange(len(sizes)),
+            no_parents,
+            pair_seed,
+            no_old_parents
+        )
+        parent2_id = np.repeat(parent2_id, sizes).astype(object)
+        parent2_id[parent2_id == 0] = None
+        first_name, last_name = pool.names(no_children, pool_rng)
+
+        children = {
+            'child_id': np.arange(first_id, first_id + no_children),
+            'parent1_id': np.repeat(parent1_id, sizes),
+            'parent2_id': parent2_id,
+            'first_name': first_name,
+            'last_name': last_name,
+            'same_residence': rng.binomial(1, .8, size=no_children) == 1,
+            'is_student': rng.binomial(1, .8, size=no_children) == 1,
+            'is_employed': rng.binomial(1, .6, size=no_children) == 1,
+        }
+
+        return {self.Children.__table__: children}
+
+    def _max_ids(self):
+        """
+        The largest parent_id and child_id in the database, 0 if a table is
+        empty.
+        """
+        with self.engine.connect() as conn:
+            return tuple(
+                conn.execute(
+                    db.select(db.func.coalesce(db.func.max(col), 0))
+                ).scalar()
+                for col in [self.Mailing.parent_id, self.Children.child_id]
             )
-            session.add(finances)
-
-        count = 0
-        p = np.exp(-np.arange(6) / 1.3)
-        p /= p.sum()
-        pairs = []
-        while count < no_children:
-
-            parent_ids = np.hstack((np.array([None]), np.arange(1, no_parents)))
-            
-            parents = np.random.choice(parent_ids, replace=False, size=2)
-            
-            try:
-                p1 = int(parents[0])
-            except:
-                p1 = None
-            try:
-                p2 = int(parents[1])
-            except:
-                p2 = None
-
-            if p1 is None:
-                p1, p2 = p2, p1
-
-            if (p1, p2) in pairs:
-                continue
-
-            if (p2, p1) in pairs:
-                continue
-
-            pairs.append((p1, p2))
-
-            amt = np.random.choice(np.arange(6), p=p)
-            amt = amt if count + amt <= no_children else no_children - count
-            count += amt
-            for _ in range(amt):
-                child = self.Children(
-                    parent1_id=p1,
-                    parent2_id=p2,
-                    first_name=self._fk.first_name(),
-                    last_name=self._fk.last_name(),
-                    same_residence=[False, True][np.random.binomial(1, .8)],
-                    is_student=[False, True][np.random.binomial(1, .8)],
-                    is_employed=[False, True][np.random.binomial(1, .6)]
+
+    def _committed_chunks(self, chunk_size):
+        """
+        The chunks that were committed by a previous run. Chunk k holds the
+        parents and children with ids k * chunk_size + 1, ...,
+        (k + 1) * chunk_size and is committed in a single transaction, so a
+        chunk was committed if and only if one of its ids is in the database.
+        """
+        committed = set()
+        with self.engine.connect() as conn:
+            for col in [self.Mailing.parent_id, self.Children.child_id]:
+                chunk_start = (col - 1) - (col - 1) % chunk_size
+                committed.update(
+                    start // chunk_size 
+                    for start in conn.execute(
+                        db.select(chunk_start).distinct()
+                    ).scalars()
                 )
-                session.add(child)
+        return committed
 
-        session.commit()
 
-        return None
+def _write_shard(chunk_nos, chunk_kwargs):
+    """
+    Writes a shard of chunks from a worker process. A DatabaseSink opens its
+    own engine in the worker, since engines can not be shared between
+    processes. The events of the phases are returned, so that the main
+    process can pass them on to its listener.
+    """
+    events = []
+    phases = Phases(events.append, path=['load'])
+    parents_and_children = ParentsAndChildren(None)
+    sink = chunk_kwargs['sink']
+    try:
+        for chunk_no in chunk_nos:
+            parents_and_children._write_chunk(
+                chunk_no, phases, **chunk_kwargs
+            )
+    finally:
+        if isinstance(sink, DatabaseSink):
+            sink.dispose()
+    return events
+
+
+def _in_memory(engine):
+    """
+    Whether engine is an in-memory sqlite database.
+    """
+    url = engine.url
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in [None, '', ':memory:']
+        or url.query.get('mode') == 'memory'
+    )
+
+
+@lru_cache(maxsize=None)
+def _faker(locale):
+    """
+    A faker.Faker for the locale, built once per process. Building one loads
+    all of its providers, which takes longer than generating a small
+    database. Since Faker.seed seeds the random generator that all instances
+    share, reusing an instance does not change the generated data.
+    """
+    from faker import Faker
+
+    return Faker(locale)
+
+
+def _chunk_families(seed, chunk_no, chunk_size, no_children, generation=0):
+    """
+    The family sizes of the children of a chunk. They are drawn from their
+    own generator, so the number of families of any chunk is known without
+    generating the chunks before it.
+    """
+    first_id = chunk_no * chunk_size + 1
+    no_chunk_children = max(
+        min(first_id + chunk_size, no_children + 1) - first_id, 0
+    )
+    rng = np.random.default_rng(
+        np.random.SeedSequence(seed, spawn_key=(chunk_no, generation, 1))
+    )
+    return family_sizes(no_chunk_children, rng)
+
+
+def _chunk_rng(seed, chunk_no, generation=0):
+    """
+    A numpy.random.Generator for a single chunk of a generation. The seed of
+    the chunk is spawned from seed, so a chunk is generated the same way no
+    matter which chunks were generated before it.
+    """
+    spawn_key = (chunk_no,) if generation == 0 else (chunk_no, generation)
+    return np.random.default_rng(
+        np.random.SeedSequence(seed, spawn_key=spawn_key)
+    )
 
 
 def Mailing(base) -> DeclarativeMeta:
@@ -545,8 +942,8 @@ def Children(base) -> DeclarativeMeta:
         __tablename__ = "children"
 
         child_id = db.Column(db.Integer(), primary_key=True, autoincrement=True)
-        parent1_id = db.Column(db.Integer())
-        parent2_id = db.Column(db.Integer(), nullable=True)
+        parent1_id = db.Column(db.Integer(), index=True)
+        parent2_id = db.Column(db.Integer(), nullable=True, index=True)
         first_name = db.Column(db.String(50))
         last_name = db.Column(db.String(50))
         same_residence = db.Column(db.Boolean())
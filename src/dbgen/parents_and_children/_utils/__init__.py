@@ -1 +1,3 @@
-from .sal_sav_start_generator import sal_sav_start_gen
+from .sal_sav_start_generator import sal_sav_start_gen, sal_sav_start_gen_batch
+from .family_sampler import family_sizes, unique_parent_pairs
+from .identity_pool import IdentityPool
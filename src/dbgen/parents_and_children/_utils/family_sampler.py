@@ -0,0 +1,165 @@
+import numpy as np
+
+
+def family_sizes(no_children, rng, max_size=5, decay=1.3):
+    """
+    This function draws the number of children in each family. The size of a
+    family is drawn from {0, ..., max_size} with probability proportional to
+    exp(-k / decay). Families are drawn until there are no_children children
+    and the last family is truncated so that the sizes sum to no_children.
+    Families with no children are dropped since they do not produce any rows.
+
+    Parameters
+    --------------------------------------------------
+    no_children : int
+        The total number of children.
+
+    rng : numpy.random.Generator
+        The generator used for the draws.
+
+    max_size : int, Default 5
+        The largest possible family.
+
+    decay : float, Default 1.3
+        The decay of the family size distribution.
+
+    Returns
+    --------------------------------------------------
+    sizes : np.array of int
+        The size of each family. Every size is positive and the sizes sum to
+        no_children.
+    """
+    p = np.exp(-np.arange(max_size + 1) / decay)
+    p /= p.sum()
+    mean = (np.arange(max_size + 1) * p).sum()
+
+    sizes = np.zeros(0, dtype=np.int64)
+    total = 0
+    while total < no_children:
+        batch = int((no_children - total) / mean * 1.1) + 16
+        draws = rng.choice(max_size + 1, size=batch, p=p)
+        sizes = np.hstack((sizes, draws[draws > 0]))
+        total = sizes.sum()
+
+    cumulative = np.cumsum(sizes)
+    last = np.searchsorted(cumulative, no_children)
+    sizes = sizes[: last + 1]
+    if len(sizes) > 0:
+        sizes[-1] -= cumulative[last] - no_children
+
+    return sizes
+
+
+def unique_parent_pairs(family_ids, no_parents, seed, no_old_parents=0):
+    """
+    This function maps family ids to unordered pairs of parents such that
+    distinct family ids always get distinct pairs. The second parent may be
+    None. The pairs are found by shuffling the set of all unordered pairs
+    with a seeded permutation and then reading off the pair in position
+    family_id, so there is no set of used pairs that needs to be searched.
+    Since the pair only depends on the seed and the family id, families can
+    be generated in any order or in separate chunks and still be unique.
+
+    The pairs are numbered so that the pairs of the parents 1, ..., n come
+    before every pair with a parent above n. With no_old_parents, only the
+    pairs with at least one parent above no_old_parents are shuffled, so the
+    families of a database that was grown with more parents never get the
+    pair of a family from before it grew.
+
+    Parameters
+    --------------------------------------------------
+    family_ids : np.array of int
+        Distinct integers in the range
+        0, ..., no_parents * (no_parents + 1) / 2 - 1.
+
+    no_parents : int
+        The parents are the integers 1, ..., no_parents.
+
+    seed : int or np.random.SeedSequence
+        The seed of the permutation.
+
+    no_old_parents : int, Default 0
+        Every pair has at least one parent above no_old_parents. The family
+        ids then range over 0, ..., no_parents * (no_parents + 1) / 2 -
+        no_old_parents * (no_old_parents + 1) / 2 - 1.
+
+    Returns
+    --------------------------------------------------
+    parent1_id : np.array of int
+        The first parent of each family.
+
+    parent2_id : np.array of int
+        The second parent of each family. A 0 means that the family only has
+        one parent.
+
+    Example Usage
+    --------------------------------------------------
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    sizes = family_sizes(600, rng)
+    p1, p2 = unique_parent_pairs(np.arange(len(sizes)), 500, seed=0)
+
+    parent1_id = np.repeat(p1, sizes)
+    parent2_id = np.repeat(p2, sizes)
+    """
+    family_ids = np.asarray(family_ids, dtype=np.uint64)
+    no_old_pairs = no_old_parents * (no_old_parents + 1) // 2
+    no_pairs = no_parents * (no_parents + 1) // 2 - no_old_pairs
+    if len(family_ids) > 0 and int(family_ids.max()) >= no_pairs:
+        raise ValueError(
+            f"{no_parents} parents only make {no_pairs} unique pairs"
+            + (
+                f" with one of the last {no_parents - no_old_parents}."
+                if no_old_parents > 0 else "."
+            )
+        )
+
+    keys = np.random.default_rng(seed).integers(
+        0, 2 ** 63, size=5, dtype=np.uint64
+    )
+    pair_ids = _permute(family_ids, no_pairs, keys[:4]).astype(np.int64)
+    pair_ids += no_old_pairs
+
+    # pair_id -> (i, j) with 0 <= i < j <= no_parents, where i = 0 is None
+    j = ((1 + np.sqrt(1 + 8 * pair_ids.astype(float))) // 2).astype(np.int64)
+    j[j * (j - 1) // 2 > pair_ids] -= 1
+    j[(j + 1) * j // 2 <= pair_ids] += 1
+    i = pair_ids - j * (j - 1) // 2
+
+    # randomize which of the two parents comes first
+    swap = (i > 0) & (_mix(family_ids, keys[4]) & np.uint64(1)).astype(bool)
+    parent1_id = np.where(swap, i, j)
+    parent2_id = np.where(swap, j, i)
+
+    return parent1_id, parent2_id
+
+
+def _mix(x, key):
+    x = x ^ key
+    x = x * np.uint64(0x9E3779B97F4A7C15)
+    x = x ^ (x >> np.uint64(29))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    return x ^ (x >> np.uint64(32))
+
+
+def _permute(x, domain, keys):
+    """
+    A Feistel network over the smallest power of four that holds domain.
+    Values that land outside of domain are permuted again until they land
+    inside of it, which keeps the map a bijection on 0, ..., domain - 1.
+    """
+    half = max((int(domain - 1).bit_length() + 1) // 2, 1)
+    shift = np.uint64(half)
+    mask = np.uint64((1 << half) - 1)
+
+    x = x.copy()
+    todo = np.arange(len(x))
+    while len(todo) > 0:
+        left, right = x[todo] >> shift, x[todo] & mask
+        for key in keys:
+            left, right = right, left ^ (_mix(right, key) & mask)
+        x[todo] = (left << shift) | right
+        todo = todo[x[todo] >= domain]
+
+    return x
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+class IdentityPool:
+    """
+    A pre-generated pool of names, addresses and bank accounts. Calling the
+    Faker providers once per row is by far the slowest part of generating the
+    mailing and children tables. Instead, the pool calls each provider size
+    many times up front and rows are then sampled from the pool by index with
+    numpy. A smaller pool is faster to build but produces more repeated
+    values. The values follow the locale of the Faker that builds the pool.
+    The state is the administrative unit of the locale, ie the county for
+    en_GB, and None for the locales that do not have one. The zip column of
+    the mailing table is an integer, so a postcode is stored as the number
+    that its digits make once dashes and spaces are dropped, ie 987-7412 as
+    9877412 for ja_JP, and postcodes with letters, ie 'SW1A 1AA' for en_GB,
+    are stored as None. As for en_US, leading zeros are lost.
+
+    Parameters
+    --------------------------------------------------
+    fkr : faker.Faker
+        The Faker used to fill the pool. Seed it before building the pool for
+        reproducability.
+
+    size : int, Default 10000
+        The number of values generated for each field.
+
+    Methods
+    --------------------------------------------------
+    mailing
+        Samples name and address columns for the mailing table.
+
+    names
+        Samples first and last names.
+
+    bank_accounts
+        Samples bank account numbers.
+
+    Example Usage
+    --------------------------------------------------
+    import faker
+    import numpy as np
+
+    faker.Faker.seed(0)
+    pool = IdentityPool(faker.Faker('en_US'), size=1000)
+
+    rng = np.random.default_rng(0)
+    mailing = pool.mailing(500, rng)
+    first_names, last_names = pool.names(600, rng)
+    """
+
+    def __init__(self, fkr, size=10000):
+        self.size = size
+        self.first_name = np.array([fkr.first_name() for _ in range(size)])
+        self.last_name = np.array([fkr.last_name() for _ in range(size)])
+        self.address = np.array([fkr.street_address() for _ in range(size)])
+        self.city = np.array([fkr.city() for _ in range(size)])
+        # not every locale has states and zipcodes, ie en_GB, so the locale
+        # independent providers are used where the locale lacks them
+        state = _provider(fkr, 'state', 'administrative_unit')
+        zipcode = _provider(fkr, 'zipcode', 'postcode')
+        self.state = np.array([state() for _ in range(size)])
+        self.zip = _zips([zipcode() for _ in range(size)])
+        self.bank_act = np.array([fkr.bban() for _ in range(size)])
+
+    def mailing(self, n, rng):
+        """
+        Returns a dictionary with the first_name, last_name, address, city,
+        state and zip columns of n rows.
+        """
+        return {
+            col: getattr(self, col)[rng.integers(0, self.size, size=n)]
+            for col in [
+                'first_name', 'last_name', 'address', 'city', 'state', 'zip'
+            ]
+        }
+
+    def names(self, n, rng):
+        """
+        Returns n first names and n last names.
+        """
+        first_name = self.first_name[rng.integers(0, self.size, size=n)]
+        last_name = self.last_name[rng.integers(0, self.size, size=n)]
+        return first_name, last_name
+
+    def bank_accounts(self, n, rng):
+        """
+        Returns n bank account numbers.
+        """
+        return self.bank_act[rng.integers(0, self.size, size=n)]
+
+
+def _zips(postcodes):
+    """
+    The postcodes as integers, None where a postcode is not a number.
+    """
+    digits = [
+        None if p is None else p.replace('-', '').replace(' ', '')
+        for p in postcodes
+    ]
+    zips = [int(d) if d and d.isdigit() else None for d in digits]
+    if None in zips:
+        return np.array(zips, dtype=object)
+    return np.array(zips)
+
+
+def _provider(fkr, *names):
+    """
+    The first of the providers names that every locale of fkr has. A locale
+    without any of them, ie en_NZ without an administrative unit, gets None
+    for every value.
+    """
+    generators = getattr(fkr, 'factories', [fkr])
+    for name in names:
+        if all(hasattr(generator, name) for generator in generators):
+            return getattr(fkr, name)
+    return lambda: None
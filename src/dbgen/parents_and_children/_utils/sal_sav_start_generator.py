@@ -140,3 +140,78 @@ def _startdate_generator(fkr,
     work_duration = work_duration.days / 365
 
     return start_date, work_duration
+
+
+def sal_sav_start_gen_batch(avgs,
+                            rng,
+                            start=dt.datetime(2000, 1, 1),
+                            end=dt.datetime(2023, 8, 15)):
+    """
+    A vectorized counterpart of sal_sav_start_gen. Rather than drawing one
+    salary, startdate and savings per call, this function draws them for a
+    whole population at once with a numpy.random.Generator. The salary,
+    savings and startdate follow the same distributions as the ones described
+    in help(sal_sav_start_gen). The startdate is drawn as an integer day
+    offset from start, so no Faker provider is needed.
+
+    Parameters
+    --------------------------------------------------
+    avgs : array of int or float
+        The average salary for the position of each person. An average of 0
+        means the person is unemployed.
+
+    rng : numpy.random.Generator
+        The generator used for all of the draws.
+
+    start : datetime, Default dt.datetime(2000, 1, 1)
+        The earliest possible startdate.
+
+    end : datetime, Default dt.datetime(2023, 8, 15)
+        The latest possible startdate. The work duration is measured up to
+        this date.
+
+    Returns
+    --------------------------------------------------
+    salary : np.array of float
+    startdate : np.array of str
+        The startdates formatted as '%Y-%m-%d'.
+    savings : np.array of float
+
+    Example Usage
+    --------------------------------------------------
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    avgs = rng.choice([0, 35, 95, 210], size=10_000_000)
+    salary, startdate, savings = sal_sav_start_gen_batch(avgs, rng)
+    """
+    avgs = np.asarray(avgs, dtype=float)
+    size = len(avgs)
+    employed = avgs > 0
+
+    sal_noise_r = rng.gamma(.1, np.where(employed, avgs, 1.0))
+    sal_noise_r -= rng.gamma(.1, np.where(employed, avgs, 1.0))
+    sal_noise_l = np.abs(rng.normal(avgs, avgs / 4))
+    salary = np.where(
+        sal_noise_r > 0,
+        sal_noise_r + sal_noise_l,
+        np.maximum(sal_noise_l, avgs / 10)
+    )
+    salary[~employed] = 0
+
+    # start and end are both possible startdates, as with date_between
+    no_days = (end - start).days
+    offsets = rng.integers(0, no_days + 1, size=size)
+    # format each possible day once and index into it
+    days = np.datetime_as_string(
+        np.datetime64(start.date(), 'D') + np.arange(no_days + 1)
+    )
+    startdate = days[offsets]
+    work_duration = (no_days - offsets) / 365
+
+    savings = rng.normal(salary * work_duration / 4, salary / 8)
+    unemployed_savings = rng.gamma(.5, 50, size=size)
+    unemployed_savings -= rng.gamma(.1, 50, size=size)
+    savings = np.where(employed, savings, unemployed_savings)
+
+    return salary, startdate, savings
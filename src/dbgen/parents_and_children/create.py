@@ -6,13 +6,32 @@ def create(engine,
            no_children=600,
            faker_seed=0,
            numpy_seed=0,
-           drop_db_if_exists=True):
+           drop_db_if_exists=True,
+           chunk_size=None,
+           identity_pool_size=10000,
+           locale=None,
+           resume=False,
+           workers=1,
+           connect_args=None,
+           defer_indexes=False,
+           sink=None,
+           listener=None,
+           generation=0):
     if not no_jobs in range(16):
         raise Exception("no_jobs must be an integer in the range of 0, ..., 15.")
-    parents_and_children = ParentsAndChildren(engine)
+    parents_and_children = ParentsAndChildren(engine, locale=locale)
     return parents_and_children.initialize(no_jobs=no_jobs,
                                            no_parents=no_parents,
                                            no_children=no_children,
                                            faker_seed=faker_seed,
                                            numpy_seed=numpy_seed,
-                                           drop_db_if_exists=drop_db_if_exists)
+                                           drop_db_if_exists=drop_db_if_exists,
+                                           chunk_size=chunk_size,
+                                           identity_pool_size=identity_pool_size,
+                                           resume=resume,
+                                           workers=workers,
+                                           connect_args=connect_args,
+                                           defer_indexes=defer_indexes,
+                                           sink=sink,
+                                           listener=listener,
+                                           generation=generation)
@@ -0,0 +1,242 @@
+import os
+from contextlib import nullcontext
+import numpy as np
+import sqlalchemy as db
+
+from .instrumentation import Phases
+from .loaders import _column_values, load, unjournaled
+
+
+class DatabaseSink:
+    """
+    Writes the generated rows into the tables of a database. Each call to
+    write is a single transaction. On sqlite the transaction runs without a
+    journal, see dbgen.loaders.unjournaled, unless durable is True.
+
+    Parameters
+    --------------------------------------------------
+    engine : sqlalchemy engine
+
+    durable : boolean, Default False
+        Keep the sqlite journal on, so that a crash in the middle of a write
+        leaves the database as it was before the write. This is slower.
+
+    connect_args : dict, Default None
+        The connect_args that the engine was created with, ie
+        {'local_infile': True} for LOAD DATA on mysql. A sink that is passed
+        to a worker process opens its own engine from the url and these
+        connect_args, since they can not be read back from the engine.
+
+    Methods
+    --------------------------------------------------
+    write
+        Loads a batch of rows of one or more tables in one transaction.
+
+    dispose
+        Closes the connections of the engine.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    sink = DatabaseSink(db.create_engine("..."))
+    sink.write({_Mailing.__table__: {'first_name': ['Megan', 'Bryan']}}, 0)
+    """
+
+    def __init__(self, engine, durable=False, connect_args=None):
+        self.engine = engine
+        self.durable = durable
+        self.connect_args = {} if connect_args is None else connect_args
+
+    def write(self, tables, part, phases=None):
+        """
+        Parameters
+        --------------------------------------------------
+        tables : dict
+            Maps each sqlalchemy.Table to a dictionary of columns, see
+            dbgen.loaders.load.
+
+        part : int
+            The number of the batch. Not used by the database.
+
+        phases : dbgen.instrumentation.Phases, Default None
+            If given, the load of each table is timed as an insert phase and
+            the commit as a commit phase.
+        """
+        if phases is None:
+            phases = Phases()
+
+        # the transaction is begun explicitly, since COPY and LOAD DATA run
+        # on the dbapi cursor and would not begin one. It is rolled back on
+        # close unless it was committed
+        with self.engine.connect() as conn:
+            with nullcontext() if self.durable else unjournaled(conn):
+                transaction = conn.begin()
+                for table, columns in tables.items():
+                    with phases.phase(
+                        'insert', table=table.name, part=part
+                    ) as counts:
+                        counts['rows'] = load(conn, table, columns)
+                with phases.phase('commit', part=part):
+                    transaction.commit()
+
+    def dispose(self):
+        self.engine.dispose()
+
+    def __getstate__(self):
+        # engines can not be shared between processes, so a worker process
+        # opens its own engine from the url and the connect_args
+        return {
+            'url': self.engine.url.render_as_string(hide_password=False),
+            'durable': self.durable,
+            'connect_args': self.connect_args,
+        }
+
+    def __setstate__(self, state):
+        self.durable = state['durable']
+        self.connect_args = state['connect_args']
+        connect_args = dict(self.connect_args)
+        if state['url'].startswith('sqlite'):
+            # concurrent writers wait on the database lock rather than fail
+            connect_args.setdefault('timeout', 600)
+        self.engine = db.create_engine(state['url'], connect_args=connect_args)
+
+
+class CsvSink:
+    """
+    Writes the generated rows to csv files instead of a database. Every
+    batch of a table is written to its own file,
+    directory/table/part-00000.csv, so batches can be written by several
+    processes at once and the files can be bulk loaded anywhere later. A
+    file is written under a temporary name and then renamed, so a file is
+    never seen half written.
+
+    Parameters
+    --------------------------------------------------
+    directory : str
+
+    Methods
+    --------------------------------------------------
+    write
+        Writes a batch of rows of one or more tables.
+
+    read
+        Reads a batch of rows of a table back as a data frame.
+
+    parts
+        The batches that were written completely.
+
+    Example Usage
+    --------------------------------------------------
+    from dbgen.parents_and_children import create
+
+    create(None, no_parents=10 ** 6, no_children=10 ** 6, sink=CsvSink('out'))
+    """
+
+    extension = 'csv'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, tables, part, phases=None):
+        """
+        Parameters
+        --------------------------------------------------
+        tables : dict
+            Maps each sqlalchemy.Table, or table name, to a dictionary of
+            columns.
+
+        part : int
+            The number of the batch. Writing a part again replaces it.
+
+        phases : dbgen.instrumentation.Phases, Default None
+            If given, the write of each file is timed as an insert phase
+            with its rows and bytes.
+        """
+        import pandas as pd
+
+        if phases is None:
+            phases = Phases()
+
+        for table, columns in tables.items():
+            if isinstance(table, db.Table):
+                # the values are stored with the types of the table columns
+                name = table.name
+                frame = pd.DataFrame({
+                    col: _column_values(table, col, values) 
+                    for col, values in columns.items()
+                })
+            else:
+                name = table
+                frame = pd.DataFrame(
+                    {col: np.asarray(values) for col, values in columns.items()}
+                )
+            path = self._path(name, part)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with phases.phase('insert', table=name, part=part) as counts:
+                self._write(frame, f'{path}.tmp')
+                os.replace(f'{path}.tmp', path)
+                counts['rows'] = len(frame)
+                counts['bytes'] = os.path.getsize(path)
+
+        # the marker is written last, so a part with a marker is complete
+        marker = os.path.join(self.directory, '_parts', f'part-{part:05d}')
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        open(marker, 'w').close()
+
+    def read(self, table, part):
+        return self._read(self._path(getattr(table, 'name', table), part))
+
+    def parts(self):
+        directory = os.path.join(self.directory, '_parts')
+        if not os.path.exists(directory):
+            return set()
+        return {int(name[5:]) for name in os.listdir(directory)}
+
+    def _path(self, name, part):
+        return os.path.join(
+            self.directory, name, f'part-{part:05d}.{self.extension}'
+        )
+
+    def _write(self, frame, path):
+        frame.to_csv(path, index=False)
+
+    def _read(self, path):
+        import pandas as pd
+
+        return pd.read_csv(path)
+
+
+class ParquetSink(CsvSink):
+    """
+    Writes the generated rows to parquet files instead of a database, see
+    CsvSink. Requires pyarrow.
+
+    Parameters
+    --------------------------------------------------
+    directory : str
+
+    compression : str, Default 'snappy'
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, directory, compression='snappy'):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(
+                "ParquetSink requires pyarrow, pip install pyarrow."
+            )
+        super().__init__(directory)
+        self.compression = compression
+
+    def _write(self, frame, path):
+        frame.to_parquet(
+            path, index=False, engine='pyarrow', compression=self.compression
+        )
+
+    def _read(self, path):
+        import pandas as pd
+
+        return pd.read_parquet(path, engine='pyarrow')
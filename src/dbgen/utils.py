@@ -1,3 +1,5 @@
+import sqlalchemy as db
+
 
 def convert_sql_to_string(filepath):
     """
@@ -79,3 +81,235 @@ def convert_sql_to_string(filepath):
         sql_code += line
         sql_code += " "
     return sql_code
+
+
+def bulk_insert(conn, table, columns, chunk_size=10000, statement=None):
+    """
+    This function will insert column batches into a table using a SQLAlchemy
+    Core insert with executemany. This avoids building one ORM object per row
+    and the unit-of-work flush that comes along with session.add. The rows are
+    sent to the database in chunks of chunk_size rows.
+
+    Parameters
+    --------------------------------------------------
+    conn : sqlalchemy connection
+        An open connection. The caller is responsible for committing.
+
+    table : sqlalchemy.Table
+        The table to insert into, ie _Mailing.__table__.
+
+    columns : dict
+        A dictionary mapping column names to equal length sequences of values.
+        The sequences may be lists or numpy arrays.
+
+    chunk_size : int, Default 10000
+        The number of rows sent to the database per executemany call.
+
+    statement : sqlalchemy insert, Default None
+        The statement that is executed with the rows, ie an upsert. If None,
+        db.insert(table).
+
+    Returns
+    --------------------------------------------------
+    int
+        The number of inserted rows.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    engine = db.create_engine("...")
+
+    with engine.begin() as conn:
+        bulk_insert(
+            conn,
+            _Mailing.__table__,
+            {'first_name': ['Megan', 'Bryan'], 'last_name': ['Chang', 'Sellers']}
+        )
+    """
+    names = list(columns.keys())
+    if len(names) == 0:
+        return 0
+
+    no_rows = len(columns[names[0]])
+    if statement is None:
+        statement = db.insert(table)
+    for start in range(0, no_rows, chunk_size):
+        chunk = []
+        for name in names:
+            values = columns[name][start: start + chunk_size]
+            # numpy arrays are converted to python types for the dbapi driver
+            if hasattr(values, 'tolist'):
+                values = values.tolist()
+            chunk.append(values)
+        rows = [dict(zip(names, row)) for row in zip(*chunk)]
+        conn.execute(statement, rows)
+
+    return no_rows
+
+
+def create_tables(engine, metadata, indexes=True, heaps=()):
+    """
+    This function creates the tables of a metadata object that do not exist
+    yet. With indexes=False the secondary indexes are left out, so that a
+    bulk load does not have to maintain them row by row, and they can be
+    built in one pass after the load with create_indexes. In the same way,
+    the tables in heaps are created without their primary key and check
+    constraints, which create_constraints adds after the load. SQLite can not
+    add a primary key to an existing table, so there the heaps are created
+    with their primary keys and check constraints as usual.
+
+    Parameters
+    --------------------------------------------------
+    engine : sqlalchemy engine
+
+    metadata : sqlalchemy.MetaData
+        The metadata of the tables, ie base.metadata.
+
+    indexes : boolean, Default True
+        Create the secondary indexes along with the tables.
+
+    heaps : list of str, Default ()
+        The names of the tables that are created without a primary key and
+        check constraints. An autoincrement column of such a table is a plain
+        column until create_constraints runs, so its values must be given.
+
+    Returns
+    --------------------------------------------------
+    list of str
+        The names of the tables that were created as heaps, which is empty on
+        SQLite.
+
+    Example Usage
+    --------------------------------------------------
+    import sqlalchemy as db
+
+    engine = db.create_engine("...")
+
+    heaps = create_tables(
+        engine, base.metadata, indexes=False, heaps=['ohlcv']
+    )
+    # bulk load the tables
+    create_constraints(engine, base.metadata, heaps)
+    create_indexes(engine, base.metadata)
+    """
+    if engine.dialect.name == 'sqlite':
+        heaps = []
+    heaps = [name for name in heaps if name in metadata.tables]
+
+    if indexes and not heaps:
+        metadata.create_all(bind=engine)
+        return heaps
+
+    with engine.begin() as conn:
+        existing = db.inspect(conn).get_table_names()
+        heaps = [name for name in heaps if name not in existing]
+        for table in metadata.sorted_tables:
+            if table.name in existing:
+                continue
+            conn.execute(db.schema.CreateTable(
+                _heap(table) if table.name in heaps else table
+            ))
+            if indexes:
+                for index in table.indexes:
+                    index.create(conn)
+
+    return heaps
+
+
+def create_constraints(engine, metadata, heaps):
+    """
+    This function adds the primary keys and check constraints of the tables
+    that create_tables created as heaps, each with an ALTER TABLE, and makes
+    their autoincrement columns autoincrement again, continuing after the
+    largest loaded value. See create_tables.
+
+    Parameters
+    --------------------------------------------------
+    engine : sqlalchemy engine
+
+    metadata : sqlalchemy.MetaData
+
+    heaps : list of str
+        The names of the tables, as returned by create_tables.
+    """
+    dialect = engine.dialect
+    preparer = dialect.identifier_preparer
+    with engine.begin() as conn:
+        for name in heaps:
+            table = metadata.tables[name]
+            conn.execute(db.schema.AddConstraint(table.primary_key))
+
+            # the check constraints are declared on the columns
+            for column in table.columns:
+                for constraint in column.constraints:
+                    if isinstance(constraint, db.CheckConstraint):
+                        conn.exec_driver_sql(
+                            f"ALTER TABLE {preparer.format_table(table)} "
+                            f"ADD CHECK ({constraint.sqltext})"
+                        )
+
+            column = table.autoincrement_column
+            if column is None:
+                continue
+            table_name = preparer.format_table(table)
+            column_name = preparer.format_column(column)
+            if dialect.name in ['mysql', 'mariadb']:
+                # mysql continues after the largest value by itself
+                column_type = column.type.compile(dialect=dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table_name} MODIFY {column_name} "
+                    f"{column_type} NOT NULL AUTO_INCREMENT"
+                )
+            elif dialect.name == 'postgresql':
+                # the sequence that a serial column would have had
+                sequence = preparer.quote(f'{table.name}_{column.name}_seq')
+                conn.exec_driver_sql(
+                    f"CREATE SEQUENCE {sequence} "
+                    f"OWNED BY {table_name}.{column_name}"
+                )
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                    f"SET DEFAULT nextval('{sequence}')"
+                )
+                conn.exec_driver_sql(
+                    f"SELECT setval('{sequence}', "
+                    f"coalesce(max({column_name}), 0) + 1, false) "
+                    f"FROM {table_name}"
+                )
+
+
+def create_indexes(engine, metadata):
+    """
+    This function creates the secondary indexes of the tables of a metadata
+    object that do not exist yet. See create_tables.
+
+    Parameters
+    --------------------------------------------------
+    engine : sqlalchemy engine
+
+    metadata : sqlalchemy.MetaData
+    """
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _heap(table):
+    """
+    A copy of table without its primary key and check constraints.
+    """
+    return db.Table(
+        table.name,
+        db.MetaData(),
+        *[
+            db.Column(
+                column.name,
+                column.type,
+                nullable=column.nullable,
+                autoincrement=False
+            )
+            for column in table.columns
+        ]
+    )
@@ -0,0 +1,247 @@
+"""
+Benchmarks parents_and_children.create and investor_returns.create at
+several scales against a sqlite file and an in memory sqlite database. The
+investor runs use SyntheticPriceSource, so nothing is downloaded.
+
+Every run is made in its own process so that the peak RSS of one run does
+not leak into the next. For each run the rows per second, the peak RSS and
+the seconds spent in each phase are written to a json file and compared to
+a stored baseline. The script exits with 1 if a run is slower or uses more
+memory than the baseline by more than the tolerance.
+
+Rows per second depend on the machine, so they are not compared directly.
+Before the runs, a fixed calibration workload, a plain Core executemany
+into an in memory sqlite database, is timed on the same machine. The
+baseline stores the speed of each run relative to the calibration, and
+only these relative speeds are compared. They still vary somewhat between
+machines and library versions, so for a tight comparison regenerate the
+baseline locally with --update-baseline on the commit you compare
+against.
+
+python tests/benchmarks/generation.py
+python tests/benchmarks/generation.py --scales 1000 100000 --tickers 10
+python tests/benchmarks/generation.py --update-baseline
+"""
+
+
+import argparse
+import datetime as dt
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'baseline.json')
+BACKENDS = ['sqlite_file', 'sqlite_memory']
+CALIBRATION_ROWS = 200000
+
+
+def run(dataset, backend, scale):
+    """
+    Runs a single benchmark in this process and returns its measurements.
+    """
+    import numpy as np
+    import sqlalchemy as db
+
+    if dataset == 'calibration':
+        return calibration(scale)
+
+    if backend == 'sqlite_file':
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        engine = db.create_engine(f'sqlite:///{path}')
+    else:
+        engine = db.create_engine('sqlite://')
+
+    tic = time.perf_counter()
+    if dataset == 'parents_and_children':
+        from dbgen.parents_and_children import create
+
+        timings = create(
+            engine, no_parents=scale, no_children=int(scale * 1.2)
+        )
+    else:
+        from dbgen.investor_returns import create
+        from dbgen.investor_returns._utils import SyntheticPriceSource
+
+        np.random.seed(0)
+        timings = create(
+            engine,
+            tickers=[f'T{i:04d}' for i in range(scale)],
+            start=dt.datetime(2023, 9, 4),
+            end=dt.datetime(2023, 9, 9),
+            price_source=SyntheticPriceSource(),
+            build_portfolio=True,
+        )
+    seconds = time.perf_counter() - tic
+
+    with engine.connect() as conn:
+        no_rows = sum(
+            conn.execute(
+                db.select(db.func.count()).select_from(db.table(name))
+            ).scalar()
+            for name in db.inspect(conn).get_table_names()
+        )
+
+    # ru_maxrss is in kilobytes on linux and in bytes on macos
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss /= 1024 ** 2 if sys.platform == 'darwin' else 1024
+
+    return {
+        'rows': no_rows,
+        'seconds': seconds,
+        'rows_per_second': no_rows / seconds,
+        'peak_rss_mb': peak_rss,
+        'phases': timings,
+    }
+
+
+def calibration(no_rows):
+    """
+    Times a fixed workload that only depends on the speed of the machine,
+    inserting no_rows rows into an in memory sqlite database with a plain
+    Core executemany.
+    """
+    import sqlalchemy as db
+
+    engine = db.create_engine('sqlite://')
+    table = db.Table(
+        'calibration',
+        db.MetaData(),
+        db.Column('id', db.Integer(), primary_key=True),
+        db.Column('name', db.String(50)),
+        db.Column('value', db.Float()),
+    )
+    table.metadata.create_all(bind=engine)
+    rows = [
+        {'id': i, 'name': f'name {i}', 'value': i / 7}
+        for i in range(no_rows)
+    ]
+
+    tic = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(table.insert(), rows)
+    seconds = time.perf_counter() - tic
+
+    return {
+        'rows': no_rows,
+        'seconds': seconds,
+        'rows_per_second': no_rows / seconds,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """
+    The runs that are slower or use more memory than the baseline by more
+    than tolerance.
+    """
+    failed = []
+    for key, result in results.items():
+        # baselines from before the calibration hold machine dependent
+        # rows per second only, which are not compared
+        if 'relative_speed' not in baseline.get(key, {}):
+            continue
+        base = baseline[key]
+        slowest = (1 - tolerance) * base['relative_speed']
+        if result['relative_speed'] < slowest:
+            failed.append(
+                f"{key}: {result['relative_speed']:.4f} times the "
+                f"calibration, baseline {base['relative_speed']:.4f}"
+            )
+        if result['peak_rss_mb'] > (1 + tolerance) * base['peak_rss_mb']:
+            failed.append(
+                f"{key}: {result['peak_rss_mb']:,.0f} MB peak RSS, "
+                f"baseline {base['peak_rss_mb']:,.0f} MB"
+            )
+    return failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--scales', type=int, nargs='+', default=[1000, 100000, 1000000],
+        help='the numbers of parents'
+    )
+    parser.add_argument(
+        '--tickers', type=int, nargs='+', default=[10, 100],
+        help='the numbers of tickers, each with 5 days of 1m bars'
+    )
+    parser.add_argument('--backends', nargs='+', default=BACKENDS)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--run', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        dataset, backend, scale = args.run
+        print(json.dumps(run(dataset, backend, int(scale))))
+        sys.exit(0)
+
+    runs = [
+        ('parents_and_children', backend, scale)
+        for scale in args.scales for backend in args.backends
+    ] + [
+        ('investor_returns', backend, scale)
+        for scale in args.tickers for backend in args.backends
+    ]
+
+    def measure(dataset, backend, scale):
+        output = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__),
+                '--run', dataset, backend, str(scale)
+            ],
+            check=True, capture_output=True, text=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    # the fastest of a few calibrations, so that one slow run does not make
+    # every run look fast
+    calibrated = max(
+        measure('calibration', 'sqlite_memory', CALIBRATION_ROWS)[
+            'rows_per_second'
+        ]
+        for _ in range(3)
+    )
+    print(f"{'calibration':45s} {calibrated:12,.0f} rows/s")
+
+    results = {}
+    for dataset, backend, scale in runs:
+        key = f'{dataset}/{backend}/{scale}'
+        results[key] = measure(dataset, backend, scale)
+        results[key]['calibration_rows_per_second'] = calibrated
+        results[key]['relative_speed'] = (
+            results[key]['rows_per_second'] / calibrated
+        )
+        print(
+            f"{key:45s} {results[key]['rows_per_second']:12,.0f} rows/s "
+            f"{results[key]['relative_speed']:8.4f} x "
+            f"{results[key]['peak_rss_mb']:8,.0f} MB"
+        )
+
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2)
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        sys.exit(0)
+    with open(args.baseline) as file:
+        failed = regressions(results, json.load(file), args.tolerance)
+    for line in failed:
+        print(f'regression {line}')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,121 @@
+"""
+Guards the import time of dbgen. Every import is made in a fresh process and
+the script exits with 1 if
+
+- importing a module pulls in one of the heavy dependencies that it should
+  only import when a code path needs them, or
+- importing a package takes longer than the budget, or
+- a create on sqlite imports a dependency that its code path does not need,
+  ie pandas for parents_and_children or yfinance with an offline price
+  source.
+
+python tests/benchmarks/imports.py
+python tests/benchmarks/imports.py --budget 0.1 --repeat 10
+"""
+
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+HEAVY = ['faker', 'pandas', 'sqlalchemy_utils', 'yfinance']
+
+# the modules to import and the heavy dependencies that they must not import
+IMPORTS = {
+    'dbgen': HEAVY,
+    'dbgen.parents_and_children': HEAVY,
+    'dbgen.investor_returns': HEAVY,
+    'dbgen.sinks': HEAVY,
+    'dbgen.loaders': HEAVY,
+    'dbgen.investor_returns._utils': ['faker', 'yfinance'],
+}
+
+# the packages whose import time must stay within the budget. The other
+# modules need sqlalchemy or pandas themselves
+PACKAGES = ['dbgen', 'dbgen.parents_and_children', 'dbgen.investor_returns']
+
+# the code paths to run and the heavy dependencies that they must not import
+RUNS = {
+    'parents_and_children.create on sqlite': (
+        "import sqlalchemy as db\n"
+        "from dbgen.parents_and_children import create\n"
+        "create(db.create_engine('sqlite://'), no_parents=10, no_children=10)\n",
+        ['pandas', 'yfinance']
+    ),
+    'investor_returns.create with SyntheticPriceSource': (
+        "import datetime as dt\n"
+        "import sqlalchemy as db\n"
+        "from dbgen.investor_returns import create\n"
+        "from dbgen.investor_returns._utils import SyntheticPriceSource\n"
+        "create(\n"
+        "    db.create_engine('sqlite://'),\n"
+        "    start=dt.datetime(2023, 9, 4),\n"
+        "    end=dt.datetime(2023, 9, 6),\n"
+        "    price_source=SyntheticPriceSource(),\n"
+        "    build_portfolio=True\n"
+        ")\n",
+        ['faker', 'yfinance']
+    ),
+}
+
+
+def imported(code, modules):
+    """
+    Runs code in a fresh process and returns the seconds it took and which of
+    modules it imported.
+    """
+    script = (
+        "import sys, time, json\n"
+        "tic = time.perf_counter()\n"
+        f"{code}"
+        "seconds = time.perf_counter() - tic\n"
+        f"print(json.dumps([seconds, [m for m in {modules!r} "
+        "if m in sys.modules]]))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--budget', type=float, default=0.05,
+        help='the most seconds the import of a package may take'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='the import time is the fastest of this many imports'
+    )
+    args = parser.parse_args()
+
+    failed = []
+    for module, forbidden in IMPORTS.items():
+        results = [
+            imported(f"import {module}\n", forbidden)
+            for _ in range(args.repeat)
+        ]
+        seconds = min(seconds for seconds, _ in results)
+        heavy = results[0][1]
+        print(f"{module:50s} {seconds:8.3f} s  {', '.join(heavy)}")
+        if heavy:
+            failed.append(f"import {module} imports {', '.join(heavy)}")
+        if module in PACKAGES and seconds > args.budget:
+            failed.append(
+                f"import {module} takes {seconds:.3f} s, "
+                f"budget {args.budget:.3f} s"
+            )
+
+    for name, (code, forbidden) in RUNS.items():
+        seconds, heavy = imported(code, forbidden)
+        print(f"{name:50s} {seconds:8.3f} s  {', '.join(heavy)}")
+        if heavy:
+            failed.append(f"{name} imports {', '.join(heavy)}")
+
+    for line in failed:
+        print(f'regression {line}')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,103 @@
+"""
+python -m pytest tests/investor_returns/test_nan_runs.py
+"""
+
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as db
+from sqlalchemy.orm import declarative_base as Base
+
+from dbgen.investor_returns._tables import OHLCV
+from dbgen.investor_returns._utils import nan_runs
+
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def ohlcv(engine, tickers=('AAA', 'BBB', 'CCC'), no_rows=40, seed=0):
+    """
+    Writes an ohlcv table with random chains of NaNs and returns it. Besides
+    the random chains, a chain runs over the end of each ticker into the
+    start of the next one and one column is NaN for a whole ticker.
+    """
+    rng = np.random.default_rng(seed)
+    dates = [
+        dt.datetime(2023, 9, 4, 9, 30) + dt.timedelta(minutes=i)
+        for i in range(no_rows)
+    ]
+    df = pd.DataFrame({
+        'ticker': np.repeat(tickers, no_rows),
+        'datetime': dates * len(tickers),
+    })
+    for col in COLUMNS:
+        values = rng.uniform(1, 100, len(df))
+        values[rng.random(len(df)) < 0.3] = np.nan
+        # a chain at the end of one ticker and the start of the next
+        values[no_rows - 5: no_rows + 5] = np.nan
+        df[col] = values
+    df.loc[df['ticker'] == tickers[1], 'low'] = np.nan
+
+    base = Base()
+    table = OHLCV(base).__table__
+    base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            table.insert(),
+            df.astype(object).where(df.notna(), None).to_dict('records')
+        )
+
+    return df
+
+
+def naive_runs(df):
+    """
+    The chains of NaNs found one row at a time.
+    """
+    runs = []
+    for (ticker, col), values in (
+        df.melt(['ticker', 'datetime'], COLUMNS, 'column')
+        .groupby(['ticker', 'column'])
+    ):
+        run = None
+        for date, value in zip(values['datetime'], values['value']):
+            if np.isnan(value):
+                if run is None:
+                    run = [ticker, col, date, date, 0]
+                run[3] = date
+                run[4] += 1
+            elif run is not None:
+                runs.append(run)
+                run = None
+        if run is not None:
+            runs.append(run)
+
+    return pd.DataFrame(
+        runs, columns=['ticker', 'column', 'start', 'end', 'length']
+    ).sort_values(['ticker', 'column', 'start'], ignore_index=True)
+
+
+def test_nan_runs_match_a_naive_scan(tmp_path):
+    engine = db.create_engine(f"sqlite:///{tmp_path / 'ohlcv.db'}")
+    df = ohlcv(engine)
+    expected = naive_runs(df)
+
+    for chunk_size in [1, 2, 3, 7, 39, 40, 41, 100000]:
+        runs = nan_runs(engine, chunk_size=chunk_size)
+
+        assert isinstance(runs['start'][0], (dt.datetime, pd.Timestamp))
+        pd.testing.assert_frame_equal(
+            runs, expected, check_dtype=False, obj=f'chunk_size={chunk_size}'
+        )
+
+
+def test_nan_runs_of_some_tickers(tmp_path):
+    engine = db.create_engine(f"sqlite:///{tmp_path / 'ohlcv.db'}")
+    df = ohlcv(engine, seed=1)
+    expected = naive_runs(df[df['ticker'] != 'BBB'])
+
+    runs = nan_runs(engine, tickers=['AAA', 'CCC'], chunk_size=6)
+
+    pd.testing.assert_frame_equal(runs, expected, check_dtype=False)
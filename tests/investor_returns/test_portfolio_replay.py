@@ -0,0 +1,208 @@
+"""
+python -m pytest tests/investor_returns/test_portfolio_replay.py
+"""
+
+
+import numpy as np
+
+from dbgen.investor_returns._utils import (
+    portfolio_replay,
+    transaction_chains
+)
+
+
+COLUMNS = [
+    'position',
+    'last_price',
+    'cost_basis',
+    'total_invested',
+    'current_value',
+    'realized_profit',
+    'gain',
+]
+
+
+def _div(a, b):
+    # MySQL gives NULL for a division by zero
+    return np.nan if b == 0 else a / b
+
+
+def trigger(user_id, ticker, position_type, action, no_shares, at_price):
+    """
+    The trigger in '_sql/trigger.sql' run on one transaction at a time. The
+    SET assignments are applied from left to right, so each one sees the
+    values assigned before it.
+    """
+    portfolio = {}
+    rows = zip(user_id, ticker, position_type, action, no_shares, at_price)
+    for user, tick, pos_type, act, n, p in rows:
+        key = (user, tick, pos_type)
+        row = portfolio.get(key)
+
+        if pos_type > 0 and act > 0:
+            if row is None:
+                portfolio[key] = {
+                    'position': n,
+                    'last_price': p,
+                    'cost_basis': p,
+                    'total_invested': p * n,
+                    'current_value': p * n,
+                    'realized_profit': 0.0,
+                    'gain': 0.0,
+                }
+                continue
+            row['position'] = row['position'] + n
+            row['last_price'] = p
+            row['cost_basis'] = _div(
+                (row['position'] - n) * row['cost_basis']
+                + n * row['last_price'],
+                row['position']
+            )
+            row['total_invested'] = row['total_invested'] + n * p
+            row['current_value'] = row['position'] * p
+            row['gain'] = _div(
+                100.0 * (
+                    row['current_value'] + row['realized_profit']
+                    - row['total_invested']
+                ),
+                row['total_invested']
+            )
+
+        elif pos_type > 0 and act < 0:
+            if row is None:
+                continue
+            row['position'] = row['position'] - n
+            row['last_price'] = p
+            row['current_value'] = row['position'] * p
+            row['realized_profit'] = row['realized_profit'] + n * p
+            row['gain'] = _div(
+                100.0 * (
+                    row['current_value'] + row['realized_profit']
+                    - row['total_invested']
+                ),
+                row['total_invested']
+            )
+
+        elif pos_type < 0 and act < 0:
+            if row is None:
+                portfolio[key] = {
+                    'position': n * -1.0,
+                    'last_price': p,
+                    'cost_basis': p,
+                    'total_invested': 0.0,
+                    'current_value': p * n * -1.0,
+                    'realized_profit': p * n,
+                    'gain': 0.0,
+                }
+                continue
+            row['position'] = row['position'] - n
+            row['last_price'] = p
+            row['cost_basis'] = _div(
+                -1.0 * (row['position'] + n) * row['cost_basis'] + n * p,
+                row['position']
+            ) * -1.0
+            row['total_invested'] = 0.0
+            row['current_value'] = row['position'] * p
+            row['realized_profit'] = row['realized_profit'] + p * n
+            row['gain'] = _div(
+                100.0 * (row['realized_profit'] + row['current_value']),
+                row['realized_profit']
+            )
+
+        elif pos_type < 0 and act > 0:
+            if row is None:
+                continue
+            row['position'] = row['position'] + n
+            row['last_price'] = p
+            row['total_invested'] = 0.0
+            row['current_value'] = row['position'] * p
+            row['realized_profit'] = row['realized_profit'] - p * n
+            row['gain'] = _div(
+                100.0 * (row['realized_profit'] + row['current_value']),
+                row['realized_profit']
+            )
+
+    return portfolio
+
+
+def transactions(seed, no_investors=20, tickers=('AAA', 'BBB', 'CCC')):
+    """
+    Long and short chains as InvestorReutrns.initialize makes them, with a
+    random price for each transaction.
+    """
+    np.random.seed(seed)
+    columns = {
+        'user_id': [], 'ticker': [], 'position_type': [], 'action': [],
+        'no_shares': []
+    }
+    for position_type, no_investments in [(1, 3), (-1, 2)]:
+        chain, _, actions, trans_sizes = transaction_chains(
+            float(position_type),
+            no_investments,
+            np.arange(50),
+            no_investors * len(tickers)
+        )
+        columns['user_id'].append(chain // len(tickers) + 1)
+        columns['ticker'].append(np.array(tickers)[chain % len(tickers)])
+        columns['position_type'].append(np.full(len(chain), position_type))
+        columns['action'].append(actions.astype(int))
+        columns['no_shares'].append(trans_sizes)
+    columns = {k: np.hstack(v) for k, v in columns.items()}
+    columns['at_price'] = np.round(
+        np.random.uniform(1, 500, len(columns['user_id'])), 2
+    )
+
+    return columns
+
+
+def test_replay_matches_the_trigger():
+    for seed in range(5):
+        columns = transactions(seed)
+        expected = trigger(*[columns[k] for k in [
+            'user_id', 'ticker', 'position_type', 'action', 'no_shares',
+            'at_price'
+        ]])
+        portfolio = portfolio_replay(**columns)
+
+        keys = list(zip(
+            portfolio['user_id'],
+            portfolio['ticker'],
+            portfolio['position_type']
+        ))
+        assert len(keys) == len(set(keys))
+        assert set(keys) == set(expected)
+
+        for column in COLUMNS:
+            np.testing.assert_array_equal(
+                portfolio[column],
+                [expected[key][column] for key in keys],
+                err_msg=column
+            )
+
+
+def test_replay_of_the_same_position_in_steps():
+    # several transactions of one position are replayed in the given order,
+    # including a short that is only traded at a price of 0, whose gain
+    # divides by zero
+    columns = {
+        'user_id': [1, 1, 1, 2, 1, 2, 2],
+        'ticker': ['AAA', 'AAA', 'AAA', 'AAA', 'AAA', 'AAA', 'AAA'],
+        'position_type': [1, 1, -1, -1, 1, -1, -1],
+        'action': [1, 1, -1, -1, -1, 1, -1],
+        'no_shares': [10.0, 5.0, 4.0, 8.0, 15.0, 2.0, 3.0],
+        'at_price': [2.0, 3.0, 7.0, 0.0, 4.0, 0.0, 0.0],
+    }
+    expected = trigger(*columns.values())
+    portfolio = portfolio_replay(**columns)
+
+    keys = list(zip(
+        portfolio['user_id'], portfolio['ticker'], portfolio['position_type']
+    ))
+    assert keys == list(expected)
+    assert np.isnan(portfolio['gain'][keys.index((2, 'AAA', -1))])
+    for column in COLUMNS:
+        np.testing.assert_array_equal(
+            portfolio[column],
+            [expected[key][column] for key in keys],
+            err_msg=column
+        )
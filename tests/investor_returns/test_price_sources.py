@@ -0,0 +1,71 @@
+"""
+python -m pytest tests/investor_returns/test_price_sources.py
+"""
+
+
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from dbgen.investor_returns._utils import (
+    CachedPriceSource,
+    SyntheticPriceSource
+)
+
+
+class FailingPriceSource:
+    """
+    Returns an empty frame for the failing tickers, the way yfinance.download
+    does when a download fails or is rate limited.
+    """
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.source = SyntheticPriceSource()
+        self.calls = []
+
+    def fetch(self, tickers, start, end, interval):
+        self.calls.append(list(tickers))
+        ok = [ticker for ticker in tickers if ticker not in self.failing]
+        if len(ok) == 0:
+            return pd.DataFrame()
+        return self.source.fetch(ok, start, end, interval)
+
+
+START, END = dt.datetime(2023, 9, 4), dt.datetime(2023, 9, 6)
+
+
+def test_an_empty_download_is_not_cached(tmp_path):
+    source = FailingPriceSource(failing=['AAA', 'BBB'])
+    cache = CachedPriceSource(source, directory=str(tmp_path))
+    df = cache.fetch(['AAA', 'BBB'], START, END, '1m')
+
+    assert df.isna().all().all()
+    with pytest.raises(FileNotFoundError):
+        CachedPriceSource(directory=str(tmp_path), offline=True).fetch(
+            ['AAA'], START, END, '1m'
+        )
+
+    # the next build downloads the gap again
+    source.failing = []
+    df = cache.fetch(['AAA', 'BBB'], START, END, '1m')
+
+    assert source.calls[-1] == ['AAA', 'BBB']
+    assert df.notna().any().all()
+
+
+def test_only_the_tickers_with_prices_are_cached(tmp_path):
+    source = FailingPriceSource(failing=['BBB'])
+    cache = CachedPriceSource(source, directory=str(tmp_path))
+    cache.fetch(['AAA', 'BBB'], START, END, '1m')
+
+    offline = CachedPriceSource(directory=str(tmp_path), offline=True)
+    offline.check(['AAA'], START, END, '1m')
+    with pytest.raises(FileNotFoundError):
+        offline.check(['BBB'], START, END, '1m')
+
+    source.failing = []
+    cache.fetch(['AAA', 'BBB'], START, END, '1m')
+
+    assert source.calls[-1] == ['BBB']
@@ -0,0 +1,79 @@
+"""
+python -m pytest tests/investor_returns/test_transaction_chains.py
+"""
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dbgen.investor_returns._utils import transaction_chains
+
+
+def chains(seed, no_investors=50, tickers=('AAA', 'BBB', 'CCC', 'DDD')):
+    """
+    The transactions of the long and short chains, with the user and ticker
+    of each chain as InvestorReutrns.initialize assigns them.
+    """
+    np.random.seed(seed)
+    dates = pd.date_range('2023-09-04 09:30', periods=30, freq='min').values
+    frames = []
+    for trans_type, no_investments in [(1.0, 3), (-1.0, 2), (1.0, 8)]:
+        chain, trans_dates, actions, trans_sizes = transaction_chains(
+            trans_type, no_investments, dates, no_investors * len(tickers)
+        )
+        frames.append(pd.DataFrame({
+            'user_id': chain // len(tickers) + 1,
+            'ticker': np.array(tickers)[chain % len(tickers)],
+            # the two long chains belong to different positions
+            'position_type': trans_type * no_investments,
+            'datetime': trans_dates,
+            'action': actions,
+            'no_shares': trans_sizes,
+        }))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_positions_never_go_negative_and_stop_when_closed():
+    for seed in range(10):
+        df = chains(seed)
+        positions = df.groupby(
+            ['user_id', 'ticker', 'position_type'], sort=False
+        )
+
+        for (_, _, position_type), chain in positions:
+            trans_type = np.sign(position_type)
+            opens = chain['action'].values == trans_type
+            sizes = chain['no_shares'].values
+            assert opens[0]
+            assert (sizes > 0).all()
+
+            # shares opened minus shares closed so far
+            running = np.cumsum(np.where(opens, sizes, -sizes))
+            assert (running >= 0).all()
+
+            # the chain ends at the first transaction that closes it
+            assert (running[:-1] > 0).all()
+
+            assert chain['datetime'].is_unique
+            assert chain['datetime'].is_monotonic_increasing
+
+
+def test_some_chains_are_closed():
+    df = chains(0)
+    totals = df.assign(
+        shares=np.where(
+            df['action'] == np.sign(df['position_type']),
+            df['no_shares'],
+            -df['no_shares']
+        )
+    ).groupby(['user_id', 'ticker', 'position_type'])['shares'].sum()
+
+    assert (totals == 0).any()
+    assert (totals > 0).any()
+
+
+def test_too_few_dates():
+    with pytest.raises(ValueError):
+        transaction_chains(1.0, 3, np.arange(2), 10)
@@ -0,0 +1,86 @@
+"""
+python -m pytest tests/parents_and_children/test_family_sampler.py
+"""
+
+
+import numpy as np
+import pytest
+import sqlalchemy as db
+
+from dbgen.parents_and_children import create
+from dbgen.parents_and_children._utils.family_sampler import (
+    family_sizes,
+    unique_parent_pairs
+)
+
+
+def test_family_sizes():
+    for seed in range(5):
+        sizes = family_sizes(1000, np.random.default_rng(seed), max_size=5)
+
+        assert sizes.sum() == 1000
+        assert sizes.min() >= 1
+        assert sizes.max() <= 5
+
+
+def test_every_pair_once():
+    no_parents = 30
+    no_pairs = no_parents * (no_parents + 1) // 2
+    p1, p2 = unique_parent_pairs(np.arange(no_pairs), no_parents, seed=0)
+
+    pairs = {(min(a, b), max(a, b)) for a, b in zip(p1, p2)}
+    assert len(pairs) == no_pairs
+    assert all(1 <= a <= no_parents for a in p1)
+    assert all(0 <= b <= no_parents for b in p2)
+    assert all(a != b for a, b in zip(p1, p2))
+
+    # the second parent is missing exactly for the pairs (i, None)
+    assert (p2 == 0).sum() == no_parents
+    assert set(p1[p2 == 0]) == set(range(1, no_parents + 1))
+
+
+def test_unordered_uniqueness_in_chunks():
+    # the pair of a family only depends on the seed and its id, so chunks
+    # of family ids give unique pairs together
+    ids = np.random.default_rng(0).permutation(5000)
+    pairs = set()
+    for chunk in np.array_split(ids, 7):
+        p1, p2 = unique_parent_pairs(chunk, 200, seed=3)
+        pairs.update((min(a, b), max(a, b)) for a, b in zip(p1, p2))
+
+    assert len(pairs) == 5000
+
+
+def test_old_parents():
+    p1, p2 = unique_parent_pairs(
+        np.arange(100 * 101 // 2 - 60 * 61 // 2), 100, 0, no_old_parents=60
+    )
+
+    assert (np.maximum(p1, p2) > 60).all()
+    assert len({(min(a, b), max(a, b)) for a, b in zip(p1, p2)}) == len(p1)
+
+
+def test_too_few_pairs():
+    with pytest.raises(ValueError):
+        unique_parent_pairs(np.arange(56), 10, seed=0)
+    with pytest.raises(ValueError):
+        unique_parent_pairs(np.arange(11), 10, seed=0, no_old_parents=9)
+
+    # 55 pairs are enough for 55 families
+    unique_parent_pairs(np.arange(55), 10, seed=0)
+
+
+def test_chunks_use_dense_family_ids():
+    # 40 parents make 820 pairs, which is enough for the families of 1200
+    # children, no matter how the children are chunked
+    for chunk_size in [None, 100, 7]:
+        engine = db.create_engine('sqlite://')
+        create(engine, no_parents=40, no_children=1200, chunk_size=chunk_size)
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                'select parent1_id, parent2_id from children'
+            ).all()
+
+        assert len(rows) == 1200
+        assert all(p1 is not None for p1, _ in rows)
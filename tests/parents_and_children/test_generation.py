@@ -0,0 +1,73 @@
+"""
+python -m pytest tests/parents_and_children/test_generation.py
+"""
+
+
+import shutil
+
+import sqlalchemy as db
+
+from dbgen.parents_and_children import create
+
+
+TABLES = ['mailing', 'employment', 'finances', 'children']
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return {
+            table: conn.exec_driver_sql(
+                f'select * from {table} order by 1'
+            ).all()
+            for table in TABLES
+        }
+
+
+def families(children):
+    """
+    The unordered parent pair of every family. The children of a family have
+    consecutive ids, so a family is a run of children with the same pair.
+    """
+    pairs = [frozenset([child[1], child[2]]) for child in children]
+    return [
+        pair for i, pair in enumerate(pairs) if i == 0 or pair != pairs[i - 1]
+    ]
+
+
+def test_generation_is_deterministic(tmp_path):
+    no_parents, no_children = 60, 80
+    base = db.create_engine(f'sqlite:///{tmp_path}/base.db')
+    create(base, no_parents=no_parents, no_children=no_children)
+    old = rows(base)
+    base.dispose()
+
+    grown = []
+    for copy in ['a', 'b']:
+        shutil.copy(f'{tmp_path}/base.db', f'{tmp_path}/{copy}.db')
+        engine = db.create_engine(f'sqlite:///{tmp_path}/{copy}.db')
+        create(
+            engine,
+            no_parents=40,
+            no_children=200,
+            chunk_size=25,
+            generation=1
+        )
+        grown.append(rows(engine))
+        engine.dispose()
+
+    assert grown[0] == grown[1]
+
+    new = grown[0]
+    assert new['mailing'][:no_parents] == old['mailing']
+    assert [row[0] for row in new['mailing']] == list(range(1, 101))
+    assert [row[0] for row in new['children']] == list(range(1, 281))
+
+    # no two families, old or new, have the same unordered pair of parents
+    all_families = families(new['children'])
+    assert len(set(all_families)) == len(all_families)
+
+    # every new family has a new parent and some also have an old parent
+    new_families = families(new['children'][no_children:])
+    parents = [sorted(p for p in pair if p is not None) for pair in new_families]
+    assert all(pair[-1] > no_parents for pair in parents)
+    assert any(pair[0] <= no_parents for pair in parents)
@@ -0,0 +1,46 @@
+"""
+python -m pytest tests/parents_and_children/test_identity_pool.py
+"""
+
+
+import faker
+import numpy as np
+import sqlalchemy as db
+
+from dbgen.parents_and_children import create
+from dbgen.parents_and_children._utils.identity_pool import IdentityPool
+
+
+def test_locales_without_states_or_zipcodes():
+    # en_GB has no state and no zipcode, de_DE has no zipcode and en_NZ has
+    # no administrative unit
+    for locale in ['en_GB', 'de_DE', 'en_NZ', ['en_US', 'en_GB']]:
+        faker.Faker.seed(0)
+        pool = IdentityPool(faker.Faker(locale), size=100)
+        mailing = pool.mailing(50, np.random.default_rng(0))
+
+        assert all(len(values) == 50 for values in mailing.values())
+        assert all(zip is None or int(zip) == zip for zip in mailing['zip'])
+
+
+def test_postcodes_as_integers():
+    faker.Faker.seed(0)
+    pool = IdentityPool(faker.Faker('en_GB'), size=100)
+
+    # postcodes with letters can not be stored in the integer zip column
+    assert all(zip is None for zip in pool.zip)
+    assert all(state is not None for state in pool.state)
+
+    # the digits of a postcode with a dash make the zip
+    pool = IdentityPool(faker.Faker('ja_JP'), size=100)
+    assert all(isinstance(zip, int) for zip in pool.zip.tolist())
+
+
+def test_create_with_a_non_us_locale():
+    engine = db.create_engine('sqlite://')
+    create(engine, no_parents=100, no_children=120, locale='en_GB')
+
+    with engine.connect() as conn:
+        zips = conn.exec_driver_sql('select zip from mailing').scalars().all()
+
+    assert zips == [None] * 100
@@ -0,0 +1,62 @@
+"""
+python -m pytest tests/parents_and_children/test_resume.py
+"""
+
+
+import sqlalchemy as db
+
+from dbgen.parents_and_children import create
+
+
+TABLES = {
+    'mailing': 'parent_id',
+    'employment': 'parent_id',
+    'finances': 'parent_id',
+    'children': 'child_id',
+}
+
+KWARGS = {'no_parents': 300, 'no_children': 420, 'chunk_size': 50}
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return {
+            table: conn.exec_driver_sql(
+                f'select * from {table} order by {key}'
+            ).all()
+            for table, key in TABLES.items()
+        }
+
+
+def test_resume_after_the_last_committed_chunk(tmp_path):
+    clean = db.create_engine(f'sqlite:///{tmp_path}/clean.db')
+    create(clean, **KWARGS)
+
+    # a run that stopped after the first three chunks
+    engine = db.create_engine(f'sqlite:///{tmp_path}/resumed.db')
+    create(engine, **KWARGS)
+    with engine.begin() as conn:
+        for table, key in TABLES.items():
+            conn.exec_driver_sql(f'delete from {table} where {key} > 150')
+
+    create(engine, resume=True, **KWARGS)
+
+    assert rows(engine) == rows(clean)
+
+
+def test_resume_refills_a_missing_chunk(tmp_path):
+    clean = db.create_engine(f'sqlite:///{tmp_path}/clean.db')
+    create(clean, **KWARGS)
+
+    # with several workers the chunks are not committed in order
+    engine = db.create_engine(f'sqlite:///{tmp_path}/resumed.db')
+    create(engine, **KWARGS)
+    with engine.begin() as conn:
+        for table, key in TABLES.items():
+            conn.exec_driver_sql(
+                f'delete from {table} where {key} between 101 and 150'
+            )
+
+    create(engine, resume=True, **KWARGS)
+
+    assert rows(engine) == rows(clean)
@@ -0,0 +1,48 @@
+"""
+python -m pytest tests/parents_and_children/test_workers.py
+"""
+
+
+import sqlalchemy as db
+
+from dbgen.parents_and_children import create
+
+
+TABLES = ['mailing', 'employment', 'finances', 'children']
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return {
+            table: conn.exec_driver_sql(
+                f'select * from {table} order by 1'
+            ).all()
+            for table in TABLES
+        }
+
+
+def test_workers_give_the_same_tables(tmp_path):
+    no_parents, no_children = 400, 520
+    built = []
+    for workers in [1, 3]:
+        engine = db.create_engine(f'sqlite:///{tmp_path}/workers{workers}.db')
+        create(
+            engine,
+            no_parents=no_parents,
+            no_children=no_children,
+            chunk_size=50,
+            workers=workers
+        )
+        built.append(rows(engine))
+        engine.dispose()
+
+    assert built[0] == built[1]
+
+    children = built[1]['children']
+    assert len(children) == no_children
+    # the children of every shard reference parents of every other shard
+    for child in children:
+        parent1_id, parent2_id = child[1], child[2]
+        assert 1 <= parent1_id <= no_parents
+        assert parent2_id is None or 1 <= parent2_id <= no_parents
+    assert max(child[1] for child in children[:50]) > 50